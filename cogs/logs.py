@@ -0,0 +1,211 @@
+import asyncio
+from dataclasses import dataclass
+
+import discord
+from discord.ext import commands
+
+from config import LOG_QUEUE_SIZE, LOG_FLUSH_INTERVAL
+from core.instrumentation import InteractionMetrics
+
+# лимиты Discord на одно сообщение
+MAX_EMBEDS_PER_MESSAGE = 10
+MAX_EMBED_CHARS_PER_MESSAGE = 6000
+
+SEND_RETRIES = 3
+# сколько ждём, пока воркер дошлёт накопленное при остановке
+STOP_TIMEOUT = 10
+
+
+@dataclass
+class LogEntry:
+    channel: discord.abc.Messageable
+    embed: discord.Embed
+    view: discord.ui.View = None
+
+
+@dataclass
+class LogStats:
+    queued: int = 0
+    sent: int = 0
+    messages: int = 0
+    dropped: int = 0
+    failed: int = 0
+    retried: int = 0
+
+
+class LogDispatcher:
+    # логи пишутся в фоне: вызывающий код только кладёт embed в очередь
+    queue: asyncio.Queue = None
+    stats: LogStats = LogStats()
+
+    _worker: asyncio.Task = None
+
+    @classmethod
+    def submit(cls, channel, embed: discord.Embed, view: discord.ui.View = None) -> bool:
+        cls.start()
+
+        try:
+            cls.queue.put_nowait(LogEntry(channel, embed, view))
+        except asyncio.QueueFull:
+            # лог не стоит того, чтобы задерживать пользователя
+            cls.stats.dropped += 1
+            return False
+
+        cls.stats.queued += 1
+        return True
+
+    @classmethod
+    def depth(cls) -> int:
+        return cls.queue.qsize() if cls.queue else 0
+
+    @classmethod
+    def snapshot(cls) -> dict:
+        return {"depth": cls.depth(), **vars(cls.stats)}
+
+    # ================== WORKER ==================
+
+    @classmethod
+    def start(cls):
+        if cls.queue is None:
+            cls.queue = asyncio.Queue(maxsize=LOG_QUEUE_SIZE)
+
+        if cls._worker is None or cls._worker.done():
+            cls._worker = asyncio.create_task(cls._run())
+
+    @classmethod
+    async def stop(cls):
+        if cls._worker is not None and not cls._worker.done():
+            # None — сигнал воркеру дослать уже взятую пачку и выйти
+            await cls.queue.put(None)
+            try:
+                await asyncio.wait_for(cls._worker, STOP_TIMEOUT)
+            except asyncio.TimeoutError:
+                print("⚠️ Log dispatcher did not flush in time")
+        cls._worker = None
+
+        # что положили после сигнала — отправляем напоследок
+        pending = []
+        while cls.queue is not None and not cls.queue.empty():
+            entry = cls.queue.get_nowait()
+            if entry is not None:
+                pending.append(entry)
+        await cls._flush(pending)
+
+    @classmethod
+    async def _run(cls):
+        loop = asyncio.get_running_loop()
+
+        while True:
+            entry = await cls.queue.get()
+            if entry is None:
+                return
+
+            pending = [entry]
+            per_channel = {entry.channel.id: 1}
+            deadline = loop.time() + LOG_FLUSH_INTERVAL
+            stopping = False
+
+            # копим до заполнения сообщения или до истечения интервала
+            while max(per_channel.values()) < MAX_EMBEDS_PER_MESSAGE:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+
+                try:
+                    entry = await asyncio.wait_for(cls.queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+
+                if entry is None:
+                    stopping = True
+                    break
+
+                pending.append(entry)
+                per_channel[entry.channel.id] = per_channel.get(entry.channel.id, 0) + 1
+
+            try:
+                await cls._flush(pending)
+            except Exception as e:
+                cls.stats.failed += len(pending)
+                print(f"⚠️ Log dispatcher flush failed: {e!r}")
+
+            if stopping:
+                return
+
+    @classmethod
+    async def _flush(cls, entries: list):
+        by_channel = {}
+        for entry in entries:
+            by_channel.setdefault(entry.channel.id, []).append(entry)
+
+        await asyncio.gather(
+            *(cls._flush_channel(channel_entries) for channel_entries in by_channel.values())
+        )
+
+    @classmethod
+    async def _flush_channel(cls, entries: list):
+        channel = entries[0].channel
+        batch = []
+        batch_chars = 0
+
+        for entry in entries:
+            size = len(entry.embed)
+
+            if batch and (
+                len(batch) >= MAX_EMBEDS_PER_MESSAGE
+                or batch_chars + size > MAX_EMBED_CHARS_PER_MESSAGE
+                or entry.view is not None
+            ):
+                await cls._send(channel, batch)
+                batch, batch_chars = [], 0
+
+            # кнопки привязаны к сообщению — такой лог уходит отдельно
+            if entry.view is not None:
+                await cls._send(channel, [entry.embed], entry.view)
+                continue
+
+            batch.append(entry.embed)
+            batch_chars += size
+
+        if batch:
+            await cls._send(channel, batch)
+
+    @classmethod
+    async def _send(cls, channel, embeds: list, view: discord.ui.View = None):
+        kwargs = {"embeds": embeds}
+        if view is not None:
+            kwargs["view"] = view
+
+        for attempt in range(SEND_RETRIES):
+            try:
+                await channel.send(**kwargs)
+            except discord.HTTPException as e:
+                # 429 сверх того, что discord.py переждал сам, — ждём и повторяем в фоне
+                if e.status == 429 and attempt + 1 < SEND_RETRIES:
+                    cls.stats.retried += 1
+                    await asyncio.sleep(getattr(e, "retry_after", None) or 2 ** attempt)
+                    continue
+
+                cls.stats.failed += len(embeds)
+                print(f"⚠️ Failed to send {len(embeds)} log embeds: {e}")
+                return
+
+            cls.stats.sent += len(embeds)
+            cls.stats.messages += 1
+            return
+
+
+class Logs(commands.Cog):
+    def __init__(self, bot):
+        self.bot = bot
+
+    async def cog_load(self):
+        LogDispatcher.start()
+        InteractionMetrics.register("log_dispatcher", LogDispatcher.snapshot)
+
+    async def cog_unload(self):
+        await LogDispatcher.stop()
+
+
+async def setup(bot):
+    await bot.add_cog(Logs(bot))
@@ -1,10 +1,46 @@
+import asyncio
+import os
+import time
+from datetime import timedelta, timezone
+
 import discord
 from discord import app_commands
-from discord.ext import commands
+from discord.ext import commands, tasks
 from utils.validators import clean_text, validate_steamid
 
-from config import TICKET_CATEGORY_ID, TICKET_ADMIN_ROLE_ID
+from config import (
+    ATTACHMENT_MIRROR,
+    TICKET_CATEGORY_ID,
+    TICKET_ADMIN_ROLE_ID,
+    TRANSCRIPT_ARCHIVE_AFTER_DAYS,
+    TRANSCRIPT_EXPORT_CONCURRENCY
+)
+from cogs.logs import LogDispatcher
+from core.attachment_mirror import AttachmentMirror
+from core.checks import InteractionError, TicketModal, TicketView, is_ticket_admin, reply, send_modal
 from core.database import Database
+from core.instrumentation import traced
+from core.search import TicketSearch
+from core.ticket_events import TicketEvents, utcnow
+from core.ticket_stats import TicketStats, seconds_since
+from core.ticket_fields import TicketFields
+from core.ticket_cache import TicketAlreadyOpen, TicketCache
+from core.tracing import LOG, stage
+from core.transcript_capture import (
+    TranscriptCapture,
+    delete_record,
+    edit_record,
+    message_record
+)
+from core.transcript_store import TranscriptStore
+from core.transcript_writer import TranscriptDataWriter, TranscriptWriter, render_records
+from core.webhooks import WebhookRegistry
+from utils.formatting import (
+    TranscriptParticipants,
+    format_average,
+    render_transcript_footer,
+    render_transcript_header
+)
 
 
 # ================== TICKET TYPES ==================
@@ -49,26 +85,41 @@ class TicketTypeSelect(discord.ui.Select):
             custom_id="ticket_type_select"
         )
 
+    @traced
     async def callback(self, interaction: discord.Interaction):
-        t = self.values[0]
-
-        if t == "unban_request":
-            await interaction.response.send_modal(UnbanModal())
-        elif t == "player_report":
-            await interaction.response.send_modal(PlayerReportModal())
-        elif t == "admin_report":
-            await interaction.response.send_modal(AdminReportModal())
-        elif t == "tech":
-            await interaction.response.send_modal(TechModal())
-
-class TicketCreateView(discord.ui.View):
+        modal = {
+            "unban_request": UnbanModal,
+            "player_report": PlayerReportModal,
+            "admin_report": AdminReportModal,
+            "tech": TechModal,
+        }[self.values[0]]()
+
+        if not await send_modal(interaction, modal):
+            await reply(
+                interaction,
+                "⏳ Форма не успела открыться — выберите категорию ещё раз.",
+                delete_after=10
+            )
+
+class TicketCreateView(TicketView):
+    # модалка может быть только первым ответом — select не откладываем
+    direct_response = frozenset({"ticket_type_select"})
+
     def __init__(self):
         super().__init__(timeout=None)
         self.add_item(TicketTypeSelect())
 
 # ================== MODALS ==================
 
-class UnbanModal(discord.ui.Modal, title="Заявление о разбане"):
+class TicketFormModal(TicketModal):
+    ticket_type: str = None
+
+    async def submit(self, interaction: discord.Interaction, fields: dict):
+        await create_ticket(interaction, self.ticket_type, fields)
+
+class UnbanModal(TicketFormModal, title="Заявление о разбане"):
+    ticket_type = "unban_request"
+
     steam = discord.ui.TextInput(label="Ваш SteamID:", required=True)
     ban_time = discord.ui.TextInput(label="Время и дата выдачи наказания:", required=True)
     description = discord.ui.TextInput(
@@ -77,26 +128,16 @@ class UnbanModal(discord.ui.Modal, title="Заявление о разбане")
         required=True
     )
 
-    async def on_submit(self, interaction: discord.Interaction):
-        try:
-            steam = validate_steamid(self.steam.value)
-            ban_time = clean_text(self.ban_time.value, 100)
-            description = clean_text(self.description.value, 1500)
-        except ValueError as e:
-            await interaction.response.send_message(
-                f"❌ {e}",
-                ephemeral=True
-            )
-            return
+    def clean(self) -> dict:
+        return {
+            "SteamID": validate_steamid(self.steam.value),
+            "Дата наказания": clean_text(self.ban_time.value, 100),
+            "Описание": clean_text(self.description.value, 1500)
+        }
 
-        await interaction.response.defer(ephemeral=True)
-        await create_ticket(interaction, "unban_request", {
-            "SteamID": steam,
-            "Дата наказания": ban_time,
-            "Описание": description
-        })
+class PlayerReportModal(TicketFormModal, title="Жалоба на игрока"):
+    ticket_type = "player_report"
 
-class PlayerReportModal(discord.ui.Modal, title="Жалоба на игрока"):
     violator = discord.ui.TextInput(label="SteamID / Ник нарушителя:", required=True)
     time = discord.ui.TextInput(label="Время и дата нарушения:", required=True)
     proofs = discord.ui.TextInput(label="Доказательства:", required=False)
@@ -106,20 +147,18 @@ class PlayerReportModal(discord.ui.Modal, title="Жалоба на игрока"
         required=True
     )
 
-    async def on_submit(self, interaction: discord.Interaction):
-        await interaction.response.defer(ephemeral=True)
-
-        from utils.validators import clean_text
-
-        await create_ticket(interaction, "player_report", {
+    def clean(self) -> dict:
+        return {
             "Нарушитель": clean_text(self.violator.value, 64),
             "Время": clean_text(self.time.value, 64),
             "Доказательства": clean_text(self.proofs.value or "Не предоставлены", 256),
             "Описание": clean_text(self.description.value, 1500)
-        })
+        }
 
 
-class AdminReportModal(discord.ui.Modal, title="Жалоба на администратора"):
+class AdminReportModal(TicketFormModal, title="Жалоба на администратора"):
+    ticket_type = "admin_report"
+
     user_steam = discord.ui.TextInput(label="Ваш SteamID:", required=True)
     admin = discord.ui.TextInput(label="SteamID/Ник администратора:", required=True)
     time = discord.ui.TextInput(label="Время и дата нарушения:", required=True)
@@ -130,35 +169,69 @@ class AdminReportModal(discord.ui.Modal, title="Жалоба на админис
         required=True
     )
 
-    async def on_submit(self, interaction: discord.Interaction):
-        await interaction.response.defer(ephemeral=True)
-        await create_ticket(interaction, "admin_report", {
-            "Ваш SteamID": self.user_steam.value,
-            "Администратор": self.admin.value,
-            "Время": self.time.value,
-            "Доказательства": self.proofs.value or "Не предоставлены",
-            "Описание": self.description.value
-        })
-
-class TechModal(discord.ui.Modal, title="Техническая помощь"):
+    def clean(self) -> dict:
+        return {
+            "Ваш SteamID": clean_text(self.user_steam.value, 64),
+            "Администратор": clean_text(self.admin.value, 64),
+            "Время": clean_text(self.time.value, 64),
+            "Доказательства": clean_text(self.proofs.value or "Не предоставлены", 256),
+            "Описание": clean_text(self.description.value, 1500)
+        }
+
+class TechModal(TicketFormModal, title="Техническая помощь"):
+    ticket_type = "tech"
+
     issue = discord.ui.TextInput(
         label="Опишите проблему",
         style=discord.TextStyle.paragraph,
         required=True
     )
 
-    async def on_submit(self, interaction: discord.Interaction):
-        await interaction.response.defer(ephemeral=True)
-        await create_ticket(interaction, "tech", {
-            "Проблема": self.issue.value
-        })
+    def clean(self) -> dict:
+        return {
+            "Проблема": clean_text(self.issue.value, 1500)
+        }
 
 # ================== HELPERS ==================
 
 async def get_ticket(channel_id: int):
-    return await Database.fetchrow(
-        "SELECT * FROM tickets WHERE channel_id = %s",
-        (channel_id,)
+    return await TicketCache.get(channel_id)
+
+
+async def mark_closed(ticket: dict, actor_id: int, by: str, **fields):
+    # кто вёл тикет, сохраняется в claimed_by и после сброса assigned_admin_id
+    admin_id = actor_id if by == "admin" else ticket.get("claimed_by")
+
+    await TicketCache.update(
+        ticket["channel_id"],
+        status="closed",
+        closed_at=utcnow(),
+        closed_by=actor_id,
+        **fields
+    )
+    TicketEvents.record(
+        ticket["id"], "closed", actor_id,
+        by=by,
+        admin_id=admin_id,
+        ticket_type=ticket["ticket_type"],
+        seconds=seconds_since(ticket["created_at"])
+    )
+
+
+async def mark_first_response(ticket: dict, admin_id: int):
+    # проверка и запись в кэш без await между ними — второе сообщение уже не засчитается
+    if ticket["status"] != "open" or ticket.get("first_response_at"):
+        return
+
+    await TicketCache.update(
+        ticket["channel_id"],
+        first_response_at=utcnow(),
+        first_responder_id=admin_id
+    )
+    TicketEvents.record(
+        ticket["id"], "first_response", admin_id,
+        ticket_type=ticket["ticket_type"],
+        seconds=seconds_since(ticket["created_at"])
     )
 
 async def send_ticket_log(
@@ -182,317 +255,140 @@ async def send_ticket_log(
         color=color
     )
 
-    await log_channel.send(embed=embed)
+    # в очередь, не дожидаясь отправки: лог-канал не тормозит пользовательские сценарии
+    with stage(LOG):
+        LogDispatcher.submit(log_channel, embed)
 
-import os
-from datetime import timezone
 
 async def generate_transcript(channel: discord.TextChannel):
-    os.makedirs("transcripts", exist_ok=True)
+    ticket = await get_ticket(channel.id)
+    participants = TranscriptParticipants()
 
-    filename = f"{channel.name}.html"
-    filepath = f"transcripts/{filename}"
+    # история из API нужна только за период, пока бот был офлайн
+    tracked = TranscriptCapture.is_tracked(channel.id)
+    await TranscriptCapture.ensure_synced(channel)
 
-    messages_html = []
-    users = set()
+    try:
+        return await store_transcript(channel, ticket, participants)
+    finally:
+        # разовое чтение (экспорт чужого канала): лог не держим и не догоняем при рестарте
+        if not tracked:
+            await TranscriptCapture.untrack(channel.id)
 
-    async for message in channel.history(limit=None, oldest_first=True):
-        users.add(message.author)
 
-        timestamp = message.created_at.astimezone(timezone.utc).strftime("%Y-%m-%d %H:%M:%S UTC")
-        author_name = str(message.author)
-        author_id = message.author.id
-        avatar_url = message.author.display_avatar.url
+async def store_transcript(channel: discord.TextChannel, ticket, participants: TranscriptParticipants):
+    # имя файла — хэш содержимого, поэтому пишем во временный файл
+    tmp_path = TranscriptStore.temp_path()
 
-        content_parts = []
+    # рядом с HTML — NDJSON с индексом смещений для постраничного просмотра
+    data = TranscriptDataWriter(os.path.splitext(tmp_path)[0])
+    await data.open()
 
-        # обычный текст
-        if message.content:
-            safe_content = (
-                message.content
-                .replace("&", "&amp;")
-                .replace("<", "&lt;")
-                .replace(">", "&gt;")
-            )
-            content_parts.append(f"<div>{safe_content}</div>")
-
-        # 📎 attachments
-        for attachment in message.attachments:
-            url = attachment.url
-            attachment_name = attachment.filename
-
-            if attachment.content_type and attachment.content_type.startswith("image"):
-                content_parts.append(
-                    f"<div class='attachment'>"
-                    f"<img src='{url}' style='max-width:400px;border-radius:8px;'>"
-                    f"</div>"
-                )
-            elif attachment.content_type and attachment.content_type.startswith("video"):
-                content_parts.append(
-                    f"<div class='attachment'>"
-                    f"<video src='{url}' controls style='max-width:400px;'></video>"
-                    f"</div>"
-                )
-            else:
-                content_parts.append(
-                    f"<div class='attachment'>"
-                    f"<a href='{url}' target='_blank'>📎 {attachment_name}</a>"
-                    f"</div>"
-                )
+    try:
+        writer = await write_transcript(
+            channel, tmp_path, data, participants, ticket["id"] if ticket else None
+        )
+    except BaseException:
+        await data.close()
+        raise
+
+    await data.close(meta={
+        "channel": channel.name,
+        # id строкой: в JS снежинки Discord не помещаются в number
+        "participants": [
+            dict(participant, id=str(participant["id"]))
+            for participant in participants
+        ],
+    })
+
+    entry = await TranscriptStore.put(
+        tmp_path,
+        writer.sha256.hexdigest(),
+        ticket_id=ticket["id"] if ticket else None,
+        channel_name=channel.name,
+        size=writer.bytes_written,
+        messages=writer.messages,
+        data_path=data.base_path
+    )
 
-        # embeds
-        for embed in message.embeds:
-            embed_block = ""
+    return f"{entry['digest']}.html", set(participants.by_author)
 
-            if embed.title:
-                embed_block += f"<div class='embed-title'>{embed.title}</div>"
 
-            if embed.description:
-                desc = (
-                    embed.description
-                    .replace("&", "&amp;")
-                    .replace("<", "&lt;")
-                    .replace(">", "&gt;")
-                )
-                embed_block += f"<div class='embed-desc'>{desc}</div>"
-
-            for field in embed.fields:
-                safe_value = (
-                    field.value
-                    .replace("&", "&amp;")
-                    .replace("<", "&lt;")
-                    .replace(">", "&gt;")
-                )
+async def write_transcript(
+    channel: discord.TextChannel,
+    tmp_path: str,
+    data: TranscriptDataWriter,
+    participants: TranscriptParticipants,
+    ticket_id: int = None
+) -> TranscriptWriter:
+    # header -> пачки сообщений -> footer; в памяти только текущие пачки.
+    # HTML собирается в пуле, пока луп читает следующую пачку из лога
+    async with TranscriptWriter(tmp_path) as writer:
+        await writer.write(render_transcript_header(channel.name))
 
-                embed_block += (
-                    f"<div class='embed-field'>"
-                    f"<b>{field.name}</b><br>{safe_value}"
-                    f"</div>"
-                )
+        pending = None
+        chunks = 0
 
-            if embed_block:
-                content_parts.append(f"<div class='embed'>{embed_block}</div>")
-
-        if not content_parts:
-            content_parts.append("<i>(empty message)</i>")
-
-        content = "".join(content_parts)
-
-        messages_html.append(f"""
-        <div class="message">
-            <img class="avatar" src="{avatar_url}">
-            <div class="body">
-                <div class="meta">
-                    <span class="author">{author_name}</span>
-                    <span class="userid">({author_id})</span>
-                    <span class="time">{timestamp}</span>
-                </div>
-                <div class="content">{content}</div>
-            </div>
-        </div>
-        """)
-
-    html = f"""
-<html>
-<head>
-    <meta charset="utf-8">
-    <title>Transcript {channel.name}</title>
-    <style>
-        body {{
-            background-color: #0f172a;
-            color: #e5e7eb;
-            font-family: Inter, Arial, sans-serif;
-            padding: 30px;
-        }}
-
-        .container {{
-            max-width: 1100px;
-            margin: auto;
-        }}
-
-        .header {{
-            display: flex;
-            align-items: center;
-            gap: 20px;
-            padding: 20px;
-            background: #020617;
-            border-radius: 12px;
-            margin-bottom: 30px;
-        }}
-
-        .header h1 {{
-            margin: 0;
-            font-size: 22px;
-        }}
-
-        .info {{
-            background: #020617;
-            border-radius: 12px;
-            padding: 20px;
-            margin-bottom: 30px;
-            display: grid;
-            grid-template-columns: repeat(auto-fit, minmax(220px, 1fr));
-            gap: 15px;
-        }}
-
-        .info div {{
-            font-size: 14px;
-        }}
-
-        .label {{
-            color: #94a3b8;
-            font-size: 12px;
-        }}
-
-        .message {{
-            display: flex;
-            gap: 12px;
-            background: #020617;
-            padding: 14px;
-            border-radius: 10px;
-        }}
-
-        .avatar {{
-            width: 42px;
-            height: 42px;
-            border-radius: 50%;
-            object-fit: cover;
-        }}
-
-        .body {{
-            flex: 1;
-        }}
-
-        .author {{
-            font-weight: 600;
-            color: #38bdf8;
-        }}
-
-        .userid {{
-            color: #64748b;
-            font-size: 11px;
-            margin-left: 4px;
-        }}
-
-        .time {{
-            color: #94a3b8;
-            font-size: 11px;
-            margin-left: 8px;
-       }}
-
-        .meta {{
-            font-size: 12px;
-            color: #94a3b8;
-            margin-bottom: 6px;
-        }}
-
-        .author {{
-            font-weight: 600;
-            color: #38bdf8;
-        }}
-
-        .content {{
-            white-space: pre-wrap;
-            line-height: 1.4;
-        }}
-
-        .attachment {{
-            margin-top: 6px;
-        }}
-
-        .embed {{
-            background: #020617;
-            border-left: 4px solid #5865f2;
-            padding: 10px;
-            border-radius: 6px;
-            margin-top: 6px;
-        }}
-        .embed-title {{
-            font-weight: 600;
-            margin-bottom: 4px;
-        }}
-
-        .embed-desc {{
-            font-size: 14px;
-            margin-bottom: 6px;
-        }}
-
-        .embed-field {{
-            font-size: 13px;
-            margin-top: 4px;
-        }}
-    </style>
-</head>
-<body>
-    <div class="container">
-        <div class="header">
-            <h1>📄 Transcript — #{channel.name}</h1>
-        </div>
-
-        <div class="info">
-            <div>
-                <div class="label">Channel</div>
-                <div>#{channel.name}</div>
-            </div>
-            <div>
-                <div class="label">Total messages</div>
-                <div>{len(messages_html)}</div>
-            </div>
-        </div>
-
-        <div class="messages">
-            {''.join(messages_html)}
-        </div>
-    </div>
-</body>
-</html>
-"""
-
-    with open(filepath, "w", encoding="utf-8") as f:
-        f.write(html)
-
-    return filename, users
+        async for batch in TranscriptCapture.iter_records(channel.id):
+            participants.annotate(batch)
 
+            # полнотекстовый индекс пополняется по пачке, пока пишется файл
+            if ticket_id is not None:
+                await TicketSearch.index_chunk(ticket_id, chunks, batch)
+                chunks += 1
 
-async def send_quick_reply(interaction: discord.Interaction, text: str):
-    channel = interaction.channel
-    user = interaction.user
+            # скачивание вложений пачки идёт, пока рендерится предыдущая
+            if ATTACHMENT_MIRROR:
+                await AttachmentMirror.mirror_records(batch)
 
-    # 🔐 проверка на админа
-    admin_role = interaction.guild.get_role(TICKET_ADMIN_ROLE_ID)
-    if not admin_role or admin_role not in user.roles:
-        await interaction.response.send_message(
-            "❌ Только для администрации.",
-            ephemeral=True,
-            delete_after=5
-        )
-        return
+            rendering = asyncio.ensure_future(render_records(batch))
+            await data.write_records(batch)
+
+            if pending:
+                await writer.write_messages(await pending[0], pending[1])
+            pending = (rendering, len(batch))
 
-    # 🔗 webhook
-    webhooks = await channel.webhooks()
-    webhook = discord.utils.get(webhooks, name="TicketSupport")
+        if pending:
+            await writer.write_messages(await pending[0], pending[1])
 
-    if not webhook:
-        webhook = await channel.create_webhook(name="TicketSupport")
+        if ticket_id is not None:
+            await TicketSearch.finish_index(ticket_id, chunks)
 
-    await webhook.send(
+        # каждый аватар скачивается один раз на участника, а не на сообщение
+        if ATTACHMENT_MIRROR:
+            await asyncio.gather(*(
+                mirror_avatar(participant) for participant in participants
+            ))
+
+        await writer.write(render_transcript_footer(writer.messages, list(participants)))
+
+    return writer
+
+
+async def mirror_avatar(participant: dict):
+    if participant["avatar_url"]:
+        local_url = await AttachmentMirror.mirror_url(participant["avatar_url"])
+        if local_url:
+            participant["avatar_url"] = local_url
+
+
+async def send_quick_reply(interaction: discord.Interaction, text: str):
+    channel = interaction.channel
+    user = interaction.user
+
+    # 🔗 webhook (кэшируется на время жизни тикета)
+    await WebhookRegistry.send(
+        channel,
         content=text,
         username=f"{user.display_name} (Support)",
         avatar_url=user.display_avatar.url
     )
 
-    if interaction.response.is_done():
-        await interaction.followup.send(
-            "✅ Сообщение отправлено.",
-            ephemeral=True,
-            delete_after=5
-        )
-    else:
-        await interaction.response.send_message(
-            "✅ Сообщение отправлено.",
-            ephemeral=True,
-            delete_after=5
-        )
+    ticket = TicketCache.peek(channel.id)
+    if ticket:
+        await mark_first_response(ticket, user.id)
+
+    await reply(interaction, "✅ Сообщение отправлено.", delete_after=5)
 
 # ================== DELETE TASK ==================
 
@@ -512,10 +408,10 @@ async def delete_ticket_channel(channel, guild, user):
         color=discord.Color.dark_red()
     )
 
-    await Database.execute(
-        "UPDATE tickets SET status = 'deleted' WHERE channel_id = %s",
-        (channel.id,)
-    )
+    ticket = await get_ticket(channel.id)
+    await TicketCache.update(channel.id, status="deleted")
+    if ticket:
+        TicketEvents.record(ticket["id"], "deleted", user.id)
 
     await channel.delete(
         reason=f"Ticket deleted by {user}"
@@ -530,44 +426,30 @@ class TicketCloseButton(discord.ui.Button):
             custom_id="ticket_close"
         )
 
+    @traced
     async def callback(self, interaction: discord.Interaction):
         ticket = await get_ticket(interaction.channel.id)
         if not ticket:
-            await interaction.followup.send(
-                "❌Ticket not found.",
-                ephemeral=True,
-                delete_after=5
-            )
-            return
+            raise InteractionError("Ticket not found.")
 
         guild = interaction.guild
-        admin_role = guild.get_role(TICKET_ADMIN_ROLE_ID)
 
-        is_admin = admin_role in interaction.user.roles if admin_role else False
+        is_admin = is_ticket_admin(interaction.user)
         is_owner = interaction.user.id == ticket["user_id"]
 
         # USER
         if is_owner and not is_admin:
-            await interaction.response.send_message(
+            await reply(
+                interaction,
                 "Вы уверены, что хотите закрыть тикет?\n"
                 "Are you sure you want to close this ticket?",
-                view=CloseConfirmView(),
-                ephemeral=True
+                view=CloseConfirmView()
             )
             return
 
         # ADMIN
         if is_admin:
-            await interaction.response.defer()
-
-            await Database.execute(
-                """
-                UPDATE tickets
-                SET status = 'closed', assigned_admin_id = NULL
-                WHERE channel_id = %s
-                """,
-                (interaction.channel.id,)
-            )
+            await mark_closed(ticket, interaction.user.id, "admin", assigned_admin_id=None)
 
             await send_ticket_log(
                 guild=guild,
@@ -590,6 +472,8 @@ class TicketCloseButton(discord.ui.Button):
                 view=TicketAdminClosedView()
             )
             return
+
+        raise InteractionError("Закрыть тикет может только его автор или администрация.")
             
 class TicketClaimButton(discord.ui.Button):
     def __init__(self):
@@ -599,31 +483,18 @@ class TicketClaimButton(discord.ui.Button):
             custom_id="ticket_claim"
         )
 
+    @traced
     async def callback(self, interaction: discord.Interaction):
-        await interaction.response.defer()
-
         guild = interaction.guild
-        admin_role = guild.get_role(TICKET_ADMIN_ROLE_ID)
 
         #проверка на админа
-        if not admin_role or admin_role not in interaction.user.roles:
-            await interaction.followup.send(
-                "❌ Только администрация может брать тикеты.",
-                ephemeral=True,
-                delete_after=5
-            )
-            return
+        if not is_ticket_admin(interaction.user):
+            raise InteractionError("Только администрация может брать тикеты.")
 
         # =================================================
         # CLAIM-LOCK: админ может вести ТОЛЬКО 1 тикет
         # =================================================
-        existing_claim = await Database.fetchrow(
-            """
-            SELECT channel_id FROM tickets
-            WHERE assigned_admin_id = %s AND status = 'open'
-            """,
-            (interaction.user.id,)
-        )
+        existing_claim = TicketCache.get_claimed_by_admin(interaction.user.id)
 
         if existing_claim:
             channel = guild.get_channel(existing_claim["channel_id"])
@@ -631,24 +502,24 @@ class TicketClaimButton(discord.ui.Button):
             if channel:
                 text += f"\nПерейдите в {channel.mention}"
 
-            await interaction.followup.send(
-                text,
-                ephemeral=True,
-                delete_after=7
-            )
+            await reply(interaction, text, delete_after=7)
             return
 
         # =================================================
         # сохраняем админа как ответственного
         # =================================================
-        await Database.execute(
-            """
-            UPDATE tickets
-            SET assigned_admin_id = %s
-            WHERE channel_id = %s
-            """,
-            (interaction.user.id, interaction.channel.id)
+        ticket = await TicketCache.update(
+            interaction.channel.id,
+            assigned_admin_id=interaction.user.id,
+            claimed_at=utcnow(),
+            claimed_by=interaction.user.id
         )
+        if ticket:
+            TicketEvents.record(
+                ticket["id"], "claimed", interaction.user.id,
+                ticket_type=ticket["ticket_type"],
+                seconds=seconds_since(ticket["created_at"])
+            )
 
         # =================================================
         # обновляем embed (поле "В работе у")
@@ -682,21 +553,12 @@ class TicketClaimButton(discord.ui.Button):
             color=discord.Color.dark_gray()
         )
 
-        await interaction.followup.send(
-            embed=admin_embed,
-            view=AdminQuickRepliesView(),
-            ephemeral=True
-        )
-
-        await interaction.followup.send(
-            "✅ Тикет взят в работу.",
-            ephemeral=True,
-            delete_after=5
-        )
+        await reply(interaction, embed=admin_embed, view=AdminQuickRepliesView())
+        await reply(interaction, "✅ Тикет взят в работу.", delete_after=5)
 
 # ================== PERSISTENT VIEW ==================
 
-class PersistentTicketView(discord.ui.View):
+class PersistentTicketView(TicketView):
     def __init__(self):
         super().__init__(timeout=None)
 
@@ -705,7 +567,7 @@ class PersistentTicketView(discord.ui.View):
 
 # ================== VIEWS ==================
 
-class TicketUserView(discord.ui.View):
+class TicketUserView(TicketView):
     def __init__(self, *, is_admin: bool):
         super().__init__(timeout=None)
 
@@ -714,7 +576,7 @@ class TicketUserView(discord.ui.View):
         if is_admin:
             self.add_item(TicketClaimButton())
 
-class CloseConfirmView(discord.ui.View):
+class CloseConfirmView(TicketView):
     def __init__(self):
         super().__init__(timeout=60)
 
@@ -723,21 +585,17 @@ class CloseConfirmView(discord.ui.View):
         style=discord.ButtonStyle.danger,
         custom_id="ticket_confirm_close"
     )
+    @traced
     async def confirm(
         self,
         interaction: discord.Interaction,
         button: discord.ui.Button
     ):
-        await interaction.response.defer(ephemeral=True)
-
         ticket = await get_ticket(interaction.channel.id)
         if not ticket:
-            return
+            raise InteractionError("Ticket not found.")
 
-        await Database.execute(
-            "UPDATE tickets SET status = 'closed' WHERE channel_id = %s",
-            (interaction.channel.id,)
-        )
+        await mark_closed(ticket, interaction.user.id, "user")
 
         await send_ticket_log(
             guild=interaction.guild,
@@ -753,7 +611,9 @@ class CloseConfirmView(discord.ui.View):
             reason="Ticket closed by owner"
         )
 
-class TicketAdminClosedView(discord.ui.View):
+class TicketAdminClosedView(TicketView):
+    admin_only = True
+
     def __init__(self):
         super().__init__(timeout=None)
 
@@ -767,17 +627,22 @@ class TicketAdminClosedView(discord.ui.View):
         style=discord.ButtonStyle.secondary,
         custom_id="ticket_admin_transcript"  
     )
+    @traced
     async def transcript(self, interaction: discord.Interaction, button: discord.ui.Button):
-        await interaction.response.defer(ephemeral=True)
-
         from config import TRANSCRIPT_PUBLIC_URL
         filename, _ = await generate_transcript(interaction.channel)
         url = f"{TRANSCRIPT_PUBLIC_URL}/transcripts/{filename}"
+        viewer_url = f"{TRANSCRIPT_PUBLIC_URL}/view/{filename.removesuffix('.html')}"
 
-        await Database.execute(
-        "UPDATE tickets SET transcript_created = 1 WHERE channel_id = %s",
-        (interaction.channel.id,)
-    )
+        await TicketCache.update(interaction.channel.id, transcript_created=1)
+
+        # закрытый тикет мог быть вытеснен из кэша — get_ticket дочитает из БД
+        ticket = await get_ticket(interaction.channel.id)
+        if ticket:
+            TicketEvents.record(
+                ticket["id"], "transcript_created", interaction.user.id,
+                digest=filename.removesuffix(".html")
+            )
 
         embed = discord.Embed(
             title="📄 Ticket Transcript",
@@ -786,23 +651,24 @@ class TicketAdminClosedView(discord.ui.View):
         )
 
         view = discord.ui.View()
-        view.add_item(discord.ui.Button(label="Open Transcript", style=discord.ButtonStyle.link, url=url))
+        view.add_item(discord.ui.Button(label="Open Transcript", style=discord.ButtonStyle.link, url=viewer_url))
+        view.add_item(discord.ui.Button(label="HTML", style=discord.ButtonStyle.link, url=url))
 
         log = interaction.guild.get_channel(int(os.getenv("TICKET_LOG_CHANNEL_ID")))
         if log:
-            await log.send(embed=embed, view=view)
+            with stage(LOG):
+                LogDispatcher.submit(log, embed, view)
 
     @discord.ui.button(
         label="Open",
         style=discord.ButtonStyle.success,
         custom_id="ticket_admin_open"          
     )
+    @traced
     async def open_ticket(self, interaction: discord.Interaction, button: discord.ui.Button):
-        await interaction.response.defer()
-
         ticket = await get_ticket(interaction.channel.id)
         if not ticket:
-            return
+            raise InteractionError("Ticket not found.")
 
         guild = interaction.guild
         user = guild.get_member(ticket["user_id"])
@@ -815,26 +681,26 @@ class TicketAdminClosedView(discord.ui.View):
         }
 
         await interaction.channel.edit(overwrites=overwrites)
+        TicketEvents.record(ticket["id"], "reopened", interaction.user.id)
 
     @discord.ui.button(
         label="Delete",
         style=discord.ButtonStyle.danger,
         custom_id="ticket_admin_delete"        
     )
+    @traced
     async def delete_ticket(self, interaction: discord.Interaction, button: discord.ui.Button):
-        await interaction.response.defer(ephemeral=True)
-
         ticket = await get_ticket(interaction.channel.id)
         if not ticket:
-            return
+            raise InteractionError("Ticket not found.")
 
     # ❌ ТРАНСКРИПТА НЕТ
         if not ticket["transcript_created"]:
-            await interaction.followup.send(
+            await reply(
+                interaction,
                 "⚠️ **Transcript не был создан!**\n"
                 "Вы уверены, что хотите удалить тикет без сохранения истории?",
-                view=DeleteConfirmView(),
-                ephemeral=True
+                view=DeleteConfirmView()
             )
             return
 
@@ -847,7 +713,9 @@ class TicketAdminClosedView(discord.ui.View):
         )
     )
 
-class DeleteConfirmView(discord.ui.View):
+class DeleteConfirmView(TicketView):
+    admin_only = True
+
     def __init__(self):
         super().__init__(timeout=30)
 
@@ -856,13 +724,12 @@ class DeleteConfirmView(discord.ui.View):
         style=discord.ButtonStyle.danger,
         custom_id="ticket_confirm_delete"
     )
+    @traced
     async def confirm(
         self,
         interaction: discord.Interaction,
         button: discord.ui.Button
     ):
-        await interaction.response.defer()
-
         channel = interaction.channel
         guild = interaction.guild
         user = interaction.user
@@ -872,11 +739,14 @@ class DeleteConfirmView(discord.ui.View):
             delete_ticket_channel(channel, guild, user)
         )
 
-class AdminQuickRepliesView(discord.ui.View):
+class AdminQuickRepliesView(TicketView):
+    admin_only = True
+
     def __init__(self):
         super().__init__(timeout=None)
 
     @discord.ui.button(label="🟢 Принято", style=discord.ButtonStyle.success)
+    @traced
     async def accepted(self, interaction: discord.Interaction, button: discord.ui.Button):
         await send_quick_reply(
             interaction,
@@ -884,6 +754,7 @@ class AdminQuickRepliesView(discord.ui.View):
         )
 
     @discord.ui.button(label="🟡 Нужны доказательства", style=discord.ButtonStyle.secondary)
+    @traced
     async def proof(self, interaction: discord.Interaction, button: discord.ui.Button):
         await send_quick_reply(
             interaction,
@@ -891,6 +762,7 @@ class AdminQuickRepliesView(discord.ui.View):
         )
 
     @discord.ui.button(label="🔵 В ожидании", style=discord.ButtonStyle.primary)
+    @traced
     async def waiting(self, interaction: discord.Interaction, button: discord.ui.Button):
         await send_quick_reply(
             interaction,
@@ -898,6 +770,7 @@ class AdminQuickRepliesView(discord.ui.View):
         )
 
     @discord.ui.button(label="🔴 Отказ", style=discord.ButtonStyle.danger)
+    @traced
     async def reject(self, interaction: discord.Interaction, button: discord.ui.Button):
         await send_quick_reply(
             interaction,
@@ -906,42 +779,75 @@ class AdminQuickRepliesView(discord.ui.View):
 
 # ================== CREATE TICKET ==================
 
+async def rollback_ticket_creation(ticket: dict, channel):
+    if channel:
+        await TranscriptCapture.untrack(channel.id)
+        try:
+            await channel.delete(reason="Ticket creation failed")
+        except discord.HTTPException:
+            pass
+
+    try:
+        await TicketCache.release(ticket)
+    except Exception as e:
+        # резерв без канала подчистится при следующем старте (TicketCache.warm)
+        print(f"⚠️ Failed to release ticket reservation {ticket['id']}: {e}")
+
 async def create_ticket(interaction: discord.Interaction, ticket_type: str, fields: dict):
     guild = interaction.guild
     user = interaction.user
 
+    letter = TICKET_TYPES[ticket_type]["letter"]
+
     # ===============================
-    # ПРОВЕРКА: 1 пользователь = 1 тикет
+    # РЕЗЕРВ: 1 пользователь = 1 тикет
+    # (гарантирует уникальный индекс в БД, до создания канала)
     # ===============================
-    existing_ticket = await Database.fetchrow(
-        "SELECT channel_id FROM tickets WHERE user_id = %s AND status = 'open'",
-        (user.id,)
-    )
+    ticket = None
 
-    if existing_ticket:
-        channel = guild.get_channel(existing_ticket["channel_id"])
-        if channel:
-            view = discord.ui.View()
-            view.add_item(
-                discord.ui.Button(
-                    label="Перейти к тикету",
-                    style=discord.ButtonStyle.link,
-                    url=f"https://discord.com/channels/{guild.id}/{channel.id}"
+    for attempt in range(2):
+        try:
+            # резерв, поля заявки и типизированные поля — одной транзакцией:
+            # тикета без полей (и полей без тикета) в БД не бывает
+            async with Database.transaction() as tx:
+                ticket = await TicketCache.reserve(ticket_type, letter, user.id, tx=tx)
+                await TicketSearch.store_form(ticket["id"], fields, tx=tx)
+                typed_fields = await TicketFields.store(
+                    ticket["id"], ticket_type, fields, tx=tx
                 )
-            )
-            await interaction.followup.send(
-                "⚠️ **У вас уже есть активный тикет.**",
-                ephemeral=True,
-                view=view
-            )
+            break
+        except TicketAlreadyOpen as e:
+            existing_ticket = e.ticket
+
+        channel_id = existing_ticket["channel_id"]
+        channel = guild.get_channel(channel_id) if channel_id else None
+
+        # канал старого тикета удалили руками — закрываем запись и пробуем ещё раз
+        if channel_id and not channel and attempt == 0:
+            await mark_closed(existing_ticket, None, "channel_missing")
+            continue
+
+        if not channel:
+            await reply(interaction, "⏳ **Ваш тикет уже создаётся.**")
             return
 
+        view = discord.ui.View()
+        view.add_item(
+            discord.ui.Button(
+                label="Перейти к тикету",
+                style=discord.ButtonStyle.link,
+                url=f"https://discord.com/channels/{guild.id}/{channel.id}"
+            )
+        )
+        await reply(interaction, "⚠️ **У вас уже есть активный тикет.**", view=view)
+        return
+
     # ===============================
-    # СОЗДАЁМ КАНАЛ (ВРЕМЕННОЕ ИМЯ)
+    # СОЗДАЁМ КАНАЛ (СРАЗУ С ИТОГОВЫМ ИМЕНЕМ)
     # ===============================
+    ticket_number = ticket["ticket_number"]
     category = guild.get_channel(TICKET_CATEGORY_ID)
     admin_role = guild.get_role(TICKET_ADMIN_ROLE_ID)
-    letter = TICKET_TYPES[ticket_type]["letter"]
 
     overwrites = {
         guild.default_role: discord.PermissionOverwrite(view_channel=False),
@@ -955,48 +861,55 @@ async def create_ticket(interaction: discord.Interaction, ticket_type: str, fiel
             manage_channels=True
         )
 
-    channel = await guild.create_text_channel(
-        name="ticket-temp",
-        category=category,
-        overwrites=overwrites
-    )
-    # ===============================
-    # ПОЛУЧАЕМ ID = НОМЕР ТИКЕТА
-    # ===============================
-    ticket_id = await Database.execute(
-        """
-        INSERT INTO tickets (ticket_type, ticket_letter, user_id, channel_id, status)
-        VALUES (%s, %s, %s, %s, 'open')
-        """,
-        (ticket_type, letter, user.id, channel.id),
-        return_lastrowid=True
-    )
+    channel = None
 
-    ticket_number = ticket_id
-    # ===============================
-    # ПЕРЕИМЕНОВЫВАЕМ КАНАЛ
-    # ===============================
-    await channel.edit(
-        name=f"ticket-{ticket_number:04d}{letter}"
-    )
-    # ===============================
-    # EMBED
-    # ===============================
-    embed = discord.Embed(
-        title=f"🎫 Тикет #{ticket_number:04d}{letter}",
-        description="Информация по обращению:",
-        color=discord.Color.blurple()
-    )
-    embed.set_thumbnail(url=user.display_avatar.url)
-    embed.add_field(name="👤 Автор тикета", value=user.mention, inline=False)
-    embed.add_field(name="👮 В работе у", value="—", inline=False)
-
-    for k, v in fields.items():
-        embed.add_field(name=k, value=v, inline=False)
+    try:
+        # переименование канала — лишний REST-вызов и лимит 2 раза / 10 минут
+        channel = await guild.create_text_channel(
+            name=f"ticket-{ticket_number:04d}{letter}",
+            category=category,
+            overwrites=overwrites
+        )
+        TranscriptCapture.track(channel.id)
 
-    embed.set_footer(text="Пожалуйста, ожидайте ответа администрации")
+        await TicketCache.attach_channel(ticket, channel.id)
 
-    await channel.send(embed=embed, view=PersistentTicketView())
+        # ===============================
+        # EMBED
+        # ===============================
+        embed = discord.Embed(
+            title=f"🎫 Тикет #{ticket_number:04d}{letter}",
+            description="Информация по обращению:",
+            color=discord.Color.blurple()
+        )
+        embed.set_thumbnail(url=user.display_avatar.url)
+        embed.add_field(name="👤 Автор тикета", value=user.mention, inline=False)
+        embed.add_field(name="👮 В работе у", value="—", inline=False)
+
+        for k, v in fields.items():
+            embed.add_field(name=k, value=v, inline=False)
+
+        # повторные обращения с тем же SteamID — индексный запрос по ticket_fields
+        if typed_fields["steam_id64"]:
+            previous = await TicketFields.count_by_steamid(
+                typed_fields["steam_id64"], ticket_type
+            ) - 1
+            if previous > 0:
+                embed.add_field(name="📚 Предыдущих обращений", value=str(previous), inline=False)
+
+        embed.set_footer(text="Пожалуйста, ожидайте ответа администрации")
+
+        await channel.send(embed=embed, view=PersistentTicketView())
+    except Exception as e:
+        # любой сбой после резерва: убираем канал-сироту и освобождаем слот
+        await rollback_ticket_creation(ticket, channel)
+        raise InteractionError("Не удалось создать тикет. Попробуйте ещё раз.") from e
+
+    # событие — только когда откатывать уже нечего
+    TicketEvents.record(
+        ticket["id"], "created", user.id,
+        user_id=user.id, ticket_type=ticket_type, channel_id=channel.id
+    )
 
     # ===============================
     # СООБЩЕНИЕ ПОЛЬЗОВАТЕЛЮ
@@ -1010,12 +923,7 @@ async def create_ticket(interaction: discord.Interaction, ticket_type: str, fiel
         )
     )
 
-    await interaction.followup.send(
-        "✅ **Тикет успешно создан.**",
-        ephemeral=True,
-        view=view,
-        delete_after=15
-    )
+    await reply(interaction, "✅ **Тикет успешно создан.**", view=view, delete_after=15)
 
     # ===============================
     # ЛОГ
@@ -1031,17 +939,191 @@ async def create_ticket(interaction: discord.Interaction, ticket_type: str, fiel
         color=discord.Color.green()
     )
 
+# ================== BULK EXPORT ==================
+
+class ExportProgress:
+    def __init__(self, job_id: int, total: int):
+        self.job_id = job_id
+        self.total = total
+        self.done = 0
+        self.failed = 0
+        self.messages = 0
+        self.started = time.monotonic()
+
+    def summary(self) -> str:
+        elapsed = max(time.monotonic() - self.started, 0.001)
+
+        return (
+            f"📦 Экспорт #{self.job_id}: {self.done + self.failed}/{self.total} каналов "
+            f"(ошибок: {self.failed})\n"
+            f"✉️ Сообщений: {self.messages} — "
+            f"{self.messages / elapsed:.1f} msg/s, "
+            f"{(self.done + self.failed) / elapsed * 60:.1f} каналов/мин"
+        )
+
+
+# category_id: один экспорт на категорию в пределах процесса
+running_exports = set()
+
+
+async def create_export_job(category: discord.CategoryChannel, user_id: int, resume: bool):
+    if resume:
+        job = await Database.fetchrow(
+            """
+            SELECT id FROM transcript_export_jobs
+            WHERE category_id = %s AND status = 'running'
+            ORDER BY id DESC LIMIT 1
+            """,
+            (category.id,)
+        )
+        if job:
+            return job["id"]
+
+    channel_ids = [channel.id for channel in category.text_channels]
+    closed = []
+
+    # только закрытые тикеты; IN-списки пачками
+    for i in range(0, len(channel_ids), 500):
+        chunk = channel_ids[i:i + 500]
+        rows = await Database.fetchall(
+            f"""
+            SELECT channel_id FROM tickets
+            WHERE status = 'closed' AND channel_id IN ({", ".join(["%s"] * len(chunk))})
+            """,
+            chunk
+        )
+        closed.extend(row["channel_id"] for row in rows)
+
+    async with Database.transaction() as tx:
+        job_id = await tx.execute(
+            "INSERT INTO transcript_export_jobs (category_id, requested_by) VALUES (%s, %s)",
+            (category.id, user_id),
+            return_lastrowid=True
+        )
+        await tx.executemany(
+            "INSERT INTO transcript_export_items (job_id, channel_id) VALUES (%s, %s)",
+            [(job_id, channel_id) for channel_id in closed]
+        )
+
+    return job_id
+
+
+async def export_channel(guild: discord.Guild, job_id: int, channel_id: int, progress: ExportProgress):
+    channel = guild.get_channel(channel_id)
+
+    try:
+        if channel is None:
+            raise LookupError("channel not found")
+
+        filename, _ = await generate_transcript(channel)
+    except Exception as e:
+        progress.failed += 1
+        await Database.execute(
+            """
+            UPDATE transcript_export_items SET status = 'failed', error = %s
+            WHERE job_id = %s AND channel_id = %s
+            """,
+            (f"{type(e).__name__}: {e}"[:255], job_id, channel_id)
+        )
+        return
+
+    entry = TranscriptStore.lookup(filename.removesuffix(".html"))
+    progress.done += 1
+    progress.messages += entry["messages"]
+
+    await Database.execute(
+        """
+        UPDATE transcript_export_items SET status = 'done', digest = %s, messages = %s
+        WHERE job_id = %s AND channel_id = %s
+        """,
+        (entry["digest"], entry["messages"], job_id, channel_id)
+    )
+    await TicketCache.update(channel_id, transcript_created=1)
+
+    ticket = await get_ticket(channel_id)
+    if ticket:
+        TicketEvents.record(
+            ticket["id"], "transcript_created", digest=entry["digest"], source="export"
+        )
+
+
+async def run_export_job(guild: discord.Guild, job_id: int, on_progress=None):
+    rows = await Database.fetchall(
+        """
+        SELECT channel_id FROM transcript_export_items
+        WHERE job_id = %s AND status = 'pending'
+        """,
+        (job_id,)
+    )
+
+    progress = ExportProgress(job_id, len(rows))
+
+    # параллелизм ограничен: у history() свой rate-limit bucket на канал,
+    # а глобальный лимит и 429 discord.py разруливает сам
+    semaphore = asyncio.Semaphore(TRANSCRIPT_EXPORT_CONCURRENCY)
+
+    async def worker(channel_id: int):
+        async with semaphore:
+            await export_channel(guild, job_id, channel_id, progress)
+
+            if on_progress:
+                await on_progress(progress)
+
+    await asyncio.gather(*(worker(row["channel_id"]) for row in rows))
+
+    await Database.execute(
+        """
+        UPDATE transcript_export_jobs SET status = 'done', finished_at = NOW()
+        WHERE id = %s
+        """,
+        (job_id,)
+    )
+
+    return progress
+
+
 # ================== COG ==================
 
 class Tickets(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
 
+    async def cog_load(self):
+        if TRANSCRIPT_ARCHIVE_AFTER_DAYS:
+            self.transcript_retention.start()
+        self.stats_rollup.start()
+
+    async def cog_unload(self):
+        self.transcript_retention.cancel()
+        self.stats_rollup.cancel()
+
+    # агрегаты для /ticket-stats: только новые события журнала с прошлого запуска
+    @tasks.loop(minutes=5)
+    async def stats_rollup(self):
+        try:
+            await TicketStats.rollup()
+        except Exception as e:
+            print(f"⚠️ Ticket stats rollup failed: {e!r}")
+
+    # старые транскрипты уезжают в месячные архивы, манифест схлопывается
+    @tasks.loop(hours=24)
+    async def transcript_retention(self):
+        try:
+            archived = await TranscriptStore.compact(TRANSCRIPT_ARCHIVE_AFTER_DAYS)
+        except Exception as e:
+            # исключение остановило бы цикл до рестарта — повторим завтра
+            print(f"⚠️ Transcript retention failed: {e!r}")
+            return
+
+        if archived:
+            print(f"📦 Archived {archived} transcripts")
+
     @app_commands.command(
         name="ticket-panel",
         description="Создать панель тикетов"
     )
     @app_commands.checks.has_permissions(administrator=True)
+    @traced
     async def ticket_panel(self, interaction: discord.Interaction):
 
         # 🔵 ОСНОВНАЯ ИНФОРМАЦИЯ
@@ -1109,7 +1191,252 @@ class Tickets(commands.Cog):
             ephemeral=True
         )
 
+    @app_commands.command(
+        name="ticket-export",
+        description="Перегенерировать транскрипты закрытых тикетов категории"
+    )
+    @app_commands.describe(
+        category="Категория с тикетами (по умолчанию — категория тикетов)",
+        resume="Продолжить незавершённый экспорт этой категории"
+    )
+    @app_commands.checks.has_permissions(administrator=True)
+    @traced
+    async def ticket_export(
+        self,
+        interaction: discord.Interaction,
+        category: discord.CategoryChannel = None,
+        resume: bool = True
+    ):
+        await interaction.response.defer(ephemeral=True)
+
+        category = category or interaction.guild.get_channel(TICKET_CATEGORY_ID)
+        if not category:
+            await interaction.followup.send("❌ Категория не найдена.", ephemeral=True)
+            return
+
+        # слот занимаем до создания задания: параллельный вызов не оставит лишнюю запись
+        if category.id in running_exports:
+            await interaction.followup.send(
+                "⏳ Экспорт этой категории уже выполняется.",
+                ephemeral=True
+            )
+            return
+
+        running_exports.add(category.id)
+
+        try:
+            await self.export_category(interaction, category, resume)
+        finally:
+            running_exports.discard(category.id)
+
+    async def export_category(
+        self,
+        interaction: discord.Interaction,
+        category: discord.CategoryChannel,
+        resume: bool
+    ):
+        job_id = await create_export_job(category, interaction.user.id, resume)
+
+        status = await interaction.followup.send(
+            f"📦 Экспорт #{job_id} запущен…",
+            ephemeral=True,
+            wait=True
+        )
+        last_update = 0.0
+
+        async def on_progress(progress: ExportProgress):
+            nonlocal last_update, status
+
+            # не чаще раза в 10 секунд; токен интеракции живёт 15 минут
+            if status is None or time.monotonic() - last_update < 10:
+                return
+
+            last_update = time.monotonic()
+            try:
+                await status.edit(content=progress.summary())
+            except discord.HTTPException:
+                status = None
+
+        progress = await run_export_job(interaction.guild, job_id, on_progress)
+
+        await send_ticket_log(
+            guild=interaction.guild,
+            title="📦 Transcript Export Finished",
+            description=f"{progress.summary()}\n🛡 Запустил: {interaction.user.mention}",
+            color=discord.Color.blurple()
+        )
+
+        if status:
+            try:
+                await status.edit(content=f"✅ {progress.summary()}")
+            except discord.HTTPException:
+                pass
+
+    @app_commands.command(
+        name="ticket-search",
+        description="Поиск по полям заявок и транскриптам тикетов"
+    )
+    @app_commands.describe(query="SteamID, ник или текст")
+    @app_commands.checks.has_role(TICKET_ADMIN_ROLE_ID)
+    @traced
+    async def ticket_search(self, interaction: discord.Interaction, query: str):
+        await interaction.response.defer(ephemeral=True)
+
+        started = time.monotonic()
+        rows = await TicketSearch.search(query)
+        elapsed = (time.monotonic() - started) * 1000
+
+        if not rows:
+            await interaction.followup.send("🔍 Ничего не найдено.", ephemeral=True)
+            return
+
+        from config import TRANSCRIPT_PUBLIC_URL
+
+        lines = []
+        for row in rows:
+            line = (
+                f"**#{row['ticket_number']:04d}{row['ticket_letter']}** · "
+                f"{TICKET_TYPES.get(row['ticket_type'], {}).get('label', row['ticket_type'])} · "
+                f"<@{row['user_id']}> · {row['status']} · "
+                f"<t:{int(row['created_at'].replace(tzinfo=timezone.utc).timestamp())}:d>"
+            )
+
+            entry = TranscriptStore.latest_for_ticket(row["id"])
+            if entry and entry.get("paged"):
+                line += f" · [транскрипт]({TRANSCRIPT_PUBLIC_URL}/view/{entry['digest']})"
+            elif row["channel_id"] and interaction.guild.get_channel(row["channel_id"]):
+                line += f" · <#{row['channel_id']}>"
+
+            lines.append(line)
+
+        embed = discord.Embed(
+            title=f"🔍 {query[:200]}",
+            description="\n".join(lines),
+            color=discord.Color.blurple()
+        )
+        embed.set_footer(text=f"{len(rows)} результатов · {elapsed:.0f} мс")
+
+        await interaction.followup.send(embed=embed, ephemeral=True)
+
+    @app_commands.command(
+        name="ticket-stats",
+        description="Статистика работы администрации по тикетам"
+    )
+    @app_commands.describe(
+        days="За сколько дней (по умолчанию 7)",
+        ticket_type="Тип тикетов",
+        admin="Только этот администратор"
+    )
+    @app_commands.choices(ticket_type=[
+        app_commands.Choice(name=data["label"], value=key)
+        for key, data in TICKET_TYPES.items()
+    ])
+    @app_commands.checks.has_role(TICKET_ADMIN_ROLE_ID)
+    @traced
+    async def ticket_stats(
+        self,
+        interaction: discord.Interaction,
+        days: app_commands.Range[int, 1, 3650] = 7,
+        ticket_type: app_commands.Choice[str] = None,
+        admin: discord.Member = None
+    ):
+        await interaction.response.defer(ephemeral=True)
+
+        # только агрегаты: короткие периоды — по часам, длинные — по дням
+        hourly = days <= 2
+        now = utcnow()
+        if hourly:
+            since = (now - timedelta(days=days)).replace(minute=0, second=0, microsecond=0)
+        else:
+            since = (now - timedelta(days=days)).replace(hour=0, minute=0, second=0, microsecond=0)
+
+        rows = await TicketStats.summary(
+            since,
+            ticket_type=ticket_type.value if ticket_type else None,
+            admin_id=admin.id if admin else None,
+            hourly=hourly
+        )
+
+        created = sum(row["created"] for row in rows)
+        closed = sum(row["closed"] for row in rows)
+
+        lines = []
+        for row in rows:
+            if not row["admin_id"]:
+                continue
+
+            lines.append(
+                f"<@{row['admin_id']}> — "
+                f"взял {row['claimed']} ({format_average(row['claim_seconds'], row['claimed'])}), "
+                f"ответил {row['responded']} ({format_average(row['response_seconds'], row['responded'])}), "
+                f"закрыл {row['closed']} ({format_average(row['close_seconds'], row['closed'])})"
+            )
+
+        embed = discord.Embed(
+            title=f"📊 Тикеты за {days} дн."
+            + (f" · {ticket_type.name}" if ticket_type else ""),
+            description="\n".join(lines[:25]) or "Нет данных за период.",
+            color=discord.Color.blurple()
+        )
+        if not admin:
+            embed.add_field(name="Создано", value=str(created))
+        embed.add_field(name="Закрыто", value=str(closed))
+        embed.set_footer(text="В скобках — среднее время от создания тикета")
+
+        await interaction.followup.send(embed=embed, ephemeral=True)
+
+    # ================== TRANSCRIPT CAPTURE ==================
+
+    @commands.Cog.listener()
+    async def on_ready(self):
+        await TranscriptCapture.resync(self.bot)
+
+    @commands.Cog.listener()
+    async def on_message(self, message: discord.Message):
+        if TranscriptCapture.is_tracked(message.channel.id):
+            await TranscriptCapture.append(message.channel.id, message_record(message))
+
+        # первый ответ администрации; только кэш, без похода в БД на каждое сообщение
+        ticket = TicketCache.peek(message.channel.id)
+        if (
+            ticket
+            and not ticket.get("first_response_at")
+            and not message.author.bot
+            and message.author.id != ticket["user_id"]
+            and isinstance(message.author, discord.Member)
+            and message.author.get_role(TICKET_ADMIN_ROLE_ID)
+        ):
+            await mark_first_response(ticket, message.author.id)
+
+    @commands.Cog.listener()
+    async def on_raw_message_edit(self, payload: discord.RawMessageUpdateEvent):
+        if TranscriptCapture.is_tracked(payload.channel_id):
+            await TranscriptCapture.append(
+                payload.channel_id,
+                edit_record(payload.message_id, payload.data)
+            )
+
+    @commands.Cog.listener()
+    async def on_raw_message_delete(self, payload: discord.RawMessageDeleteEvent):
+        if TranscriptCapture.is_tracked(payload.channel_id):
+            await TranscriptCapture.append(payload.channel_id, delete_record(payload.message_id))
+
+    @commands.Cog.listener()
+    async def on_raw_bulk_message_delete(self, payload: discord.RawBulkMessageDeleteEvent):
+        if TranscriptCapture.is_tracked(payload.channel_id):
+            for message_id in sorted(payload.message_ids):
+                await TranscriptCapture.append(payload.channel_id, delete_record(message_id))
+
+    @commands.Cog.listener()
+    async def on_guild_channel_delete(self, channel: discord.abc.GuildChannel):
+        WebhookRegistry.invalidate(channel.id)
+
+        if TranscriptCapture.is_tracked(channel.id):
+            await TranscriptCapture.untrack(channel.id)
+
 async def setup(bot):
     await bot.add_cog(Tickets(bot))
 
-    bot.add_view(PersistentTicketView())
\ No newline at end of file
+    bot.add_view(TicketCreateView())
+    bot.add_view(PersistentTicketView())
+    bot.add_view(TicketAdminClosedView())
\ No newline at end of file
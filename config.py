@@ -25,10 +25,62 @@ MYSQL_USER = os.getenv("MYSQL_USER")
 MYSQL_PASSWORD = os.getenv("MYSQL_PASSWORD")
 MYSQL_DATABASE = os.getenv("MYSQL_DATABASE")
 
+# пул соединений: под пиковое создание тикетов, recycle < wait_timeout сервера
+MYSQL_POOL_MINSIZE = int(os.getenv("MYSQL_POOL_MINSIZE", "2"))
+MYSQL_POOL_MAXSIZE = int(os.getenv("MYSQL_POOL_MAXSIZE", "10"))
+MYSQL_POOL_RECYCLE = int(os.getenv("MYSQL_POOL_RECYCLE", "3600"))
+MYSQL_CONNECT_TIMEOUT = float(os.getenv("MYSQL_CONNECT_TIMEOUT", "5"))
+MYSQL_ACQUIRE_TIMEOUT = float(os.getenv("MYSQL_ACQUIRE_TIMEOUT", "10"))
+
+# сколько закрытых тикетов держать в памяти (открытые кэшируются все)
+TICKET_CACHE_SIZE = int(os.getenv("TICKET_CACHE_SIZE", "1000"))
+
+# при старте догоняем схему миграциями; "0" — только проверка версии
+DB_AUTO_MIGRATE = os.getenv("DB_AUTO_MIGRATE", "1") == "1"
+
 TRANSCRIPT_HOST = os.getenv("TRANSCRIPT_HOST", "0.0.0.0")
 TRANSCRIPT_PORT = int(os.getenv("TRANSCRIPT_PORT", "8080"))
 TRANSCRIPT_PUBLIC_URL = os.getenv("TRANSCRIPT_PUBLIC_URL")
+TRANSCRIPTS_DIR = os.getenv("TRANSCRIPTS_DIR", "transcripts")
+
+# транскрипты старше N дней упаковываются в месячные zip-архивы (0 — не архивировать)
+TRANSCRIPT_ARCHIVE_AFTER_DAYS = int(os.getenv("TRANSCRIPT_ARCHIVE_AFTER_DAYS", "180"))
+
+# сколько каналов /ticket-export обрабатывает параллельно
+TRANSCRIPT_EXPORT_CONCURRENCY = int(os.getenv("TRANSCRIPT_EXPORT_CONCURRENCY", "3"))
 
 TICKET_LOG_CHANNEL_ID = int(
     os.getenv("TICKET_LOG_CHANNEL_ID", "0")
 )
+
+# размер чанка (в символах), которым транскрипт сбрасывается на диск
+TRANSCRIPT_CHUNK_SIZE = int(os.getenv("TRANSCRIPT_CHUNK_SIZE", "65536"))
+
+# где рендерить HTML транскриптов: process | thread | inline
+TRANSCRIPT_RENDER_EXECUTOR = os.getenv("TRANSCRIPT_RENDER_EXECUTOR", "process")
+TRANSCRIPT_RENDER_WORKERS = int(os.getenv("TRANSCRIPT_RENDER_WORKERS", "2"))
+
+# локальные копии вложений для транскриптов (ссылки CDN Discord протухают)
+ATTACHMENT_MIRROR = os.getenv("ATTACHMENT_MIRROR", "0") == "1"
+ATTACHMENT_MIRROR_CONCURRENCY = int(os.getenv("ATTACHMENT_MIRROR_CONCURRENCY", "4"))
+ATTACHMENT_MAX_SIZE = int(os.getenv("ATTACHMENT_MAX_SIZE_MB", "50")) * 1024 * 1024
+ATTACHMENT_DOWNLOAD_TIMEOUT = float(os.getenv("ATTACHMENT_DOWNLOAD_TIMEOUT", "120"))
+
+# фоновая отправка логов тикетов: размер очереди и как долго копить пачку (сек)
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "1000"))
+LOG_FLUSH_INTERVAL = float(os.getenv("LOG_FLUSH_INTERVAL", "2"))
+
+# журнал событий тикетов пишется пачками: размер пачки и период сброса (сек)
+TICKET_EVENTS_BATCH_SIZE = int(os.getenv("TICKET_EVENTS_BATCH_SIZE", "100"))
+TICKET_EVENTS_FLUSH_INTERVAL = float(os.getenv("TICKET_EVENTS_FLUSH_INTERVAL", "1"))
+
+# в лог попадают взаимодействия дольше N сек или подтверждённые позже N сек
+INTERACTION_SLOW_SECONDS = float(os.getenv("INTERACTION_SLOW_SECONDS", "2"))
+INTERACTION_SLOW_ACK_SECONDS = float(os.getenv("INTERACTION_SLOW_ACK_SECONDS", "1.5"))
+# за сколько сек от создания взаимодействия бот подтверждает его сам (дедлайн Discord — 3)
+INTERACTION_ACK_BUDGET = float(os.getenv("INTERACTION_ACK_BUDGET", "2"))
+
+# /metrics — отдельным сервером: публичный сервер транскриптов за прокси видит
+# все запросы как локальные. 0 — не поднимать
+METRICS_HOST = os.getenv("METRICS_HOST", "127.0.0.1")
+METRICS_PORT = int(os.getenv("METRICS_PORT", "9108"))
@@ -0,0 +1,239 @@
+import asyncio
+import hashlib
+import json
+import os
+import re
+import uuid
+from urllib.parse import urlsplit
+
+import aiohttp
+
+from config import (
+    TRANSCRIPTS_DIR,
+    ATTACHMENT_MIRROR_CONCURRENCY,
+    ATTACHMENT_MAX_SIZE,
+    ATTACHMENT_DOWNLOAD_TIMEOUT
+)
+
+ATTACHMENTS_DIR = os.path.join(TRANSCRIPTS_DIR, "attachments")
+TMP_DIR = os.path.join(ATTACHMENTS_DIR, "tmp")
+INDEX_PATH = os.path.join(ATTACHMENTS_DIR, "index.jsonl")
+
+DOWNLOAD_CHUNK_SIZE = 1 << 16
+
+# <sha256>.<ext> — только такие имена сервер отдаёт из хранилища
+ATTACHMENT_NAME_RE = re.compile(r"([0-9a-f]{64})(\.[a-z0-9]{1,10})?")
+
+
+def attachment_path(name: str) -> str:
+    return os.path.join(ATTACHMENTS_DIR, name[:2], name[2:4], name)
+
+
+def attachment_key(url: str) -> str:
+    # у ссылок CDN меняется подпись в query (?ex=&is=&hm=), сам путь стабилен
+    parts = urlsplit(url)
+    return f"{parts.netloc}{parts.path}"
+
+
+def _extension(filename: str) -> str:
+    extension = os.path.splitext(filename or "")[1].lower()
+    return extension if ATTACHMENT_NAME_RE.fullmatch("0" * 64 + extension) else ""
+
+
+class AttachmentTooLarge(Exception):
+    pass
+
+
+class AttachmentMirror:
+    # ключ CDN-ссылки -> имя файла в хранилище
+    by_key: dict = {}
+    loaded: bool = False
+
+    _session = None
+    _semaphore = None
+    _inflight: dict = {}
+    _lock = asyncio.Lock()
+
+    @classmethod
+    async def load(cls):
+        cls.by_key = await asyncio.to_thread(_read_index)
+        cls.loaded = True
+
+        await asyncio.to_thread(_clear_dir, TMP_DIR)
+
+    @classmethod
+    def session(cls) -> aiohttp.ClientSession:
+        # одна сессия на процесс: общий пул соединений к CDN
+        if cls._session is None or cls._session.closed:
+            cls._session = aiohttp.ClientSession(
+                timeout=aiohttp.ClientTimeout(total=ATTACHMENT_DOWNLOAD_TIMEOUT),
+                raise_for_status=True
+            )
+            cls._semaphore = asyncio.Semaphore(ATTACHMENT_MIRROR_CONCURRENCY)
+        return cls._session
+
+    @classmethod
+    async def close(cls):
+        if cls._session is not None:
+            await cls._session.close()
+            cls._session = None
+
+    # ================== MIRROR ==================
+
+    @classmethod
+    async def mirror_records(cls, records: list):
+        # подменяет url вложений на локальные; то, что скачать не вышло, остаётся ссылкой на CDN
+        if not cls.loaded:
+            await cls.load()
+
+        attachments = [
+            attachment
+            for record in records
+            for attachment in record["attachments"]
+        ]
+        if not attachments:
+            return
+
+        names = await asyncio.gather(
+            *(cls.mirror(attachment) for attachment in attachments)
+        )
+
+        for attachment, name in zip(attachments, names):
+            if name:
+                attachment["source_url"] = attachment["url"]
+                attachment["url"] = f"/attachments/{name}"
+
+    @classmethod
+    async def mirror_url(cls, url: str):
+        # для аватаров и прочих картинок без метаданных вложения
+        if not cls.loaded:
+            await cls.load()
+
+        name = await cls.mirror({
+            "url": url,
+            "filename": os.path.basename(urlsplit(url).path),
+            "content_type": None,
+        })
+        return f"/attachments/{name}" if name else None
+
+    @classmethod
+    async def mirror(cls, attachment: dict):
+        key = attachment_key(attachment["url"])
+
+        name = cls.by_key.get(key)
+        if name:
+            return name
+
+        # одно вложение в нескольких транскриптах одновременно качаем один раз
+        task = cls._inflight.get(key)
+        if task is None:
+            task = cls._inflight[key] = asyncio.ensure_future(
+                cls._download(key, attachment)
+            )
+            task.add_done_callback(lambda _: cls._inflight.pop(key, None))
+
+        return await asyncio.shield(task)
+
+    @classmethod
+    async def _download(cls, key: str, attachment: dict):
+        session = cls.session()
+        tmp_path = os.path.join(TMP_DIR, uuid.uuid4().hex)
+
+        async with cls._semaphore:
+            try:
+                sha256, size = await cls._stream(session, attachment["url"], tmp_path)
+            except (aiohttp.ClientError, asyncio.TimeoutError, AttachmentTooLarge, OSError) as e:
+                await asyncio.to_thread(_remove_silent, tmp_path)
+                print(f"⚠️ Attachment not mirrored ({attachment['filename']}): {e!r}")
+                return None
+
+        name = sha256.hexdigest() + _extension(attachment["filename"])
+
+        # одинаковое содержимое под разными ссылками хранится один раз
+        await asyncio.to_thread(_commit_file, tmp_path, attachment_path(name))
+
+        async with cls._lock:
+            await asyncio.to_thread(_append_index, {
+                "key": key,
+                "name": name,
+                "size": size,
+                "content_type": attachment["content_type"],
+            })
+            cls.by_key[key] = name
+
+        return name
+
+    @classmethod
+    async def _stream(cls, session: aiohttp.ClientSession, url: str, tmp_path: str):
+        sha256 = hashlib.sha256()
+        size = 0
+
+        async with session.get(url) as response:
+            if response.content_length and response.content_length > ATTACHMENT_MAX_SIZE:
+                raise AttachmentTooLarge(f"{response.content_length} bytes")
+
+            await asyncio.to_thread(os.makedirs, TMP_DIR, exist_ok=True)
+            file = await asyncio.to_thread(open, tmp_path, "wb")
+
+            try:
+                # в памяти только текущий чанк, даже для больших видео
+                async for chunk in response.content.iter_chunked(DOWNLOAD_CHUNK_SIZE):
+                    size += len(chunk)
+                    if size > ATTACHMENT_MAX_SIZE:
+                        raise AttachmentTooLarge(f"more than {ATTACHMENT_MAX_SIZE} bytes")
+
+                    sha256.update(chunk)
+                    await asyncio.to_thread(file.write, chunk)
+            finally:
+                await asyncio.to_thread(file.close)
+
+        return sha256, size
+
+
+# ================== FILE HELPERS ==================
+
+def _remove_silent(path: str):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def _clear_dir(path: str):
+    if not os.path.isdir(path):
+        return
+
+    for name in os.listdir(path):
+        _remove_silent(os.path.join(path, name))
+
+
+def _commit_file(tmp_path: str, target: str):
+    if os.path.isfile(target):
+        _remove_silent(tmp_path)
+        return
+
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    os.replace(tmp_path, target)
+
+
+def _read_index() -> dict:
+    if not os.path.isfile(INDEX_PATH):
+        return {}
+
+    index = {}
+
+    with open(INDEX_PATH, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                entry = json.loads(line)
+                index[entry["key"]] = entry["name"]
+
+    return index
+
+
+def _append_index(entry: dict):
+    os.makedirs(ATTACHMENTS_DIR, exist_ok=True)
+
+    with open(INDEX_PATH, "a", encoding="utf-8") as f:
+        f.write(json.dumps(entry, ensure_ascii=False) + "\n")
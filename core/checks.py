@@ -0,0 +1,158 @@
+import abc
+import asyncio
+import traceback
+
+import discord
+
+from config import INTERACTION_ACK_BUDGET, TICKET_ADMIN_ROLE_ID
+from core.instrumentation import begin, record_auto_ack, reject, trace
+
+# interaction.id -> Lock: сторож и обработчик не должны ответить оба
+_ack_locks: dict = {}
+# ссылки на сторожей: без них незавершённую задачу может собрать GC
+_watchdogs: set = set()
+
+
+class InteractionError(Exception):
+    # ожидаемый отказ сценария: текст уходит пользователю как есть
+    pass
+
+
+def is_ticket_admin(member) -> bool:
+    # роли участника лежат в кэше гильдии (intents.members) — без REST и БД
+    return isinstance(member, discord.Member) and member.get_role(TICKET_ADMIN_ROLE_ID) is not None
+
+
+def _lock(interaction: discord.Interaction) -> asyncio.Lock:
+    # без сторожа гонки нет — хватает одноразового замка
+    return _ack_locks.get(interaction.id) or asyncio.Lock()
+
+
+# ================== ACKNOWLEDGEMENT ==================
+
+def arm(interaction: discord.Interaction, budget: float = INTERACTION_ACK_BUDGET):
+    # бюджет отсчитывается от создания взаимодействия: задержка шлюза тоже в счёт
+    if interaction.id in _ack_locks:
+        return
+
+    age = (discord.utils.utcnow() - interaction.created_at).total_seconds()
+    _ack_locks[interaction.id] = asyncio.Lock()
+    task = asyncio.create_task(_watchdog(interaction, max(0.0, budget - age)))
+    _watchdogs.add(task)
+    task.add_done_callback(_watchdogs.discard)
+
+
+async def _watchdog(interaction: discord.Interaction, delay: float):
+    try:
+        await asyncio.sleep(delay)
+
+        if await acknowledge(interaction):
+            record_auto_ack()
+    except discord.HTTPException as e:
+        print(f"⚠️ Failed to acknowledge interaction {interaction.id}: {e}")
+    finally:
+        _ack_locks.pop(interaction.id, None)
+
+
+async def acknowledge(interaction: discord.Interaction, *, ephemeral: bool = True) -> bool:
+    async with _lock(interaction):
+        if interaction.response.is_done():
+            return False
+
+        await interaction.response.defer(ephemeral=ephemeral)
+        return True
+
+
+async def reply(interaction: discord.Interaction, content: str = None, *, delete_after: float = None, **kwargs):
+    # один ответ вне зависимости от того, подтверждено ли уже взаимодействие
+    kwargs.setdefault("ephemeral", True)
+
+    async with _lock(interaction):
+        if not interaction.response.is_done():
+            await interaction.response.send_message(content, delete_after=delete_after, **kwargs)
+            return
+
+    # у followup нет delete_after — удаляем сами
+    message = await interaction.followup.send(content, wait=delete_after is not None, **kwargs)
+    if delete_after is not None:
+        await message.delete(delay=delete_after)
+
+
+async def send_modal(interaction: discord.Interaction, modal: discord.ui.Modal) -> bool:
+    # модалка — только первым ответом; если сторож успел отложить, её уже не открыть
+    async with _lock(interaction):
+        if interaction.response.is_done():
+            return False
+
+        await interaction.response.send_modal(modal)
+        return True
+
+
+async def report_error(interaction: discord.Interaction, error: Exception):
+    if isinstance(error, InteractionError):
+        message = f"❌ {error}"
+        cause = error.__cause__
+    else:
+        message = "❌ Произошла ошибка. Попробуйте ещё раз."
+        cause = error
+
+    if cause is not None:
+        traceback.print_exception(type(cause), cause, cause.__traceback__)
+
+    try:
+        await reply(interaction, message, delete_after=10)
+    except discord.HTTPException as e:
+        print(f"⚠️ Failed to report interaction error: {e}")
+
+
+# ================== BASE CLASSES ==================
+
+class TicketView(discord.ui.View):
+    # кнопки только для администрации тикетов
+    admin_only: bool = False
+    # custom_id элементов, которые отвечают сами (модалкой) — их не откладываем
+    direct_response: frozenset = frozenset()
+
+    async def interaction_check(self, interaction: discord.Interaction) -> bool:
+        begin(interaction)
+        arm(interaction)
+
+        if self.admin_only and not is_ticket_admin(interaction.user):
+            await reply(interaction, "❌ Только для администрации.", delete_after=5)
+            reject(f"{type(self).__name__}.interaction_check")
+            return False
+
+        if interaction.data.get("custom_id") not in self.direct_response:
+            await acknowledge(interaction)
+
+        return True
+
+    async def on_error(self, interaction: discord.Interaction, error: Exception, item: discord.ui.Item):
+        await report_error(interaction, error)
+
+
+class TicketModal(discord.ui.Modal, metaclass=abc.ABCMeta):
+    # проверка полей до подтверждения: ошибку ещё можно показать первым ответом
+    @abc.abstractmethod
+    def clean(self) -> dict:
+        ...
+
+    @abc.abstractmethod
+    async def submit(self, interaction: discord.Interaction, fields: dict):
+        ...
+
+    async def on_submit(self, interaction: discord.Interaction):
+        with trace(f"{type(self).__name__}.on_submit", interaction):
+            arm(interaction)
+
+            try:
+                fields = self.clean()
+            except ValueError as e:
+                await reply(interaction, f"❌ {e}")
+                return
+
+            await acknowledge(interaction)
+            await self.submit(interaction, fields)
+
+    async def on_error(self, interaction: discord.Interaction, error: Exception):
+        await report_error(interaction, error)
@@ -1,62 +1,638 @@
+import asyncio
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+
 import aiomysql
 from config import (
     MYSQL_HOST,
     MYSQL_PORT,
     MYSQL_USER,
     MYSQL_PASSWORD,
-    MYSQL_DATABASE
+    MYSQL_DATABASE,
+    MYSQL_POOL_MINSIZE,
+    MYSQL_POOL_MAXSIZE,
+    MYSQL_POOL_RECYCLE,
+    MYSQL_CONNECT_TIMEOUT,
+    MYSQL_ACQUIRE_TIMEOUT,
+    DB_AUTO_MIGRATE
 )
+from core.tracing import DB, DB_WAIT, record
+
+
+# ================== METRICS ==================
+
+class LatencySample:
+    def __init__(self, size: int = 4096):
+        self.values = deque(maxlen=size)
+        self.count = 0
+        self.total = 0.0
+
+    def add(self, seconds: float):
+        self.values.append(seconds)
+        self.count += 1
+        self.total += seconds
+
+    def percentile(self, p: float) -> float:
+        if not self.values:
+            return 0.0
+
+        ordered = sorted(self.values)
+        index = min(len(ordered) - 1, int(round(p / 100 * (len(ordered) - 1))))
+        return ordered[index]
+
+    def summary(self) -> dict:
+        return {
+            "count": self.count,
+            "avg_ms": round(self.total / self.count * 1000, 2) if self.count else 0.0,
+            "p50_ms": round(self.percentile(50) * 1000, 2),
+            "p95_ms": round(self.percentile(95) * 1000, 2),
+            "p99_ms": round(self.percentile(99) * 1000, 2),
+            "max_ms": round(max(self.values, default=0.0) * 1000, 2),
+        }
+
+
+class PoolMetrics:
+    def __init__(self):
+        self.acquire_wait = LatencySample()
+        self.query_latency = LatencySample()
+        self.acquire_timeouts = 0
+        self.query_errors = 0
+
+
+metrics = PoolMetrics()
+
+
+@asynccontextmanager
+async def _timed_query():
+    started = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        metrics.query_errors += 1
+        raise
+    finally:
+        elapsed = time.perf_counter() - started
+        metrics.query_latency.add(elapsed)
+        # этап db текущего взаимодействия, если запрос идёт из обработчика
+        record(DB, elapsed)
+
+
+# ================== MIGRATIONS ==================
+
+async def _column_exists(cur, table: str, column: str) -> bool:
+    await cur.execute(
+        """
+        SELECT 1 FROM information_schema.COLUMNS
+        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND COLUMN_NAME = %s
+        """,
+        (table, column)
+    )
+    return await cur.fetchone() is not None
+
+
+async def _index_exists(cur, table: str, index: str) -> bool:
+    await cur.execute(
+        """
+        SELECT 1 FROM information_schema.STATISTICS
+        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND INDEX_NAME = %s
+        """,
+        (table, index)
+    )
+    return await cur.fetchone() is not None
+
+
+async def _add_column(cur, table: str, column: str, definition: str):
+    # колонку могли добавить руками на живой базе — не падаем
+    if not await _column_exists(cur, table, column):
+        await cur.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+
+
+async def _add_index(cur, table: str, index: str, definition: str):
+    if not await _index_exists(cur, table, index):
+        await cur.execute(f"ALTER TABLE {table} ADD {definition}")
+
+
+async def _001_create_tickets(cur):
+    await cur.execute(
+        """
+        CREATE TABLE IF NOT EXISTS tickets (
+            id INT AUTO_INCREMENT PRIMARY KEY,
+            ticket_number INT NOT NULL,
+            ticket_type VARCHAR(32) NOT NULL,
+            ticket_letter CHAR(1) NOT NULL,
+            user_id BIGINT NOT NULL,
+            channel_id BIGINT,
+            status ENUM('open', 'closed') DEFAULT 'open',
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+        """
+    )
+
+
+async def _002_ticket_columns(cur):
+    await _add_column(cur, "tickets", "assigned_admin_id", "BIGINT NULL")
+    await _add_column(
+        cur, "tickets", "transcript_created", "TINYINT(1) NOT NULL DEFAULT 0"
+    )
+
+    # код пишет status = 'deleted' и не передаёт ticket_number при INSERT
+    await cur.execute(
+        """
+        ALTER TABLE tickets
+            MODIFY status ENUM('open', 'closed', 'deleted') NOT NULL DEFAULT 'open',
+            MODIFY ticket_number INT NOT NULL DEFAULT 0
+        """
+    )
+
+
+async def _003_ticket_indexes(cur):
+    # get_ticket / кнопки
+    await _add_index(
+        cur, "tickets", "uq_tickets_channel",
+        "UNIQUE KEY uq_tickets_channel (channel_id)"
+    )
+    # 1 пользователь = 1 открытый тикет
+    await _add_index(
+        cur, "tickets", "idx_tickets_user_status",
+        "KEY idx_tickets_user_status (user_id, status, channel_id)"
+    )
+    # claim-lock
+    await _add_index(
+        cur, "tickets", "idx_tickets_admin_status",
+        "KEY idx_tickets_admin_status (assigned_admin_id, status, channel_id)"
+    )
+
+
+async def _004_open_ticket_unique(cur):
+    # до уникального индекса: оставляем открытым только последний тикет пользователя
+    await cur.execute(
+        """
+        UPDATE tickets t
+        JOIN (
+            SELECT user_id, MAX(id) AS keep_id FROM tickets
+            WHERE status = 'open'
+            GROUP BY user_id
+            HAVING COUNT(*) > 1
+        ) d ON d.user_id = t.user_id
+        SET t.status = 'closed'
+        WHERE t.status = 'open' AND t.id <> d.keep_id
+        """
+    )
+
+    # NULL для закрытых — уникальность действует только на открытые тикеты
+    await _add_column(
+        cur, "tickets", "open_user_id",
+        "BIGINT AS (IF(status = 'open', user_id, NULL)) STORED"
+    )
+    await _add_index(
+        cur, "tickets", "uq_tickets_open_user",
+        "UNIQUE KEY uq_tickets_open_user (open_user_id)"
+    )
+
+
+async def _005_transcript_exports(cur):
+    await cur.execute(
+        """
+        CREATE TABLE IF NOT EXISTS transcript_export_jobs (
+            id INT AUTO_INCREMENT PRIMARY KEY,
+            category_id BIGINT NOT NULL,
+            requested_by BIGINT NOT NULL,
+            status ENUM('running', 'done') NOT NULL DEFAULT 'running',
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            finished_at TIMESTAMP NULL,
+            KEY idx_export_jobs_category (category_id, status)
+        )
+        """
+    )
+    # чекпоинт по каждому каналу: после рестарта продолжаем с pending
+    await cur.execute(
+        """
+        CREATE TABLE IF NOT EXISTS transcript_export_items (
+            job_id INT NOT NULL,
+            channel_id BIGINT NOT NULL,
+            status ENUM('pending', 'done', 'failed') NOT NULL DEFAULT 'pending',
+            digest CHAR(64) NULL,
+            messages INT NULL,
+            error VARCHAR(255) NULL,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+            PRIMARY KEY (job_id, channel_id),
+            KEY idx_export_items_status (job_id, status)
+        )
+        """
+    )
+
+
+async def _006_ticket_search(cur):
+    # поля модалки как есть: label/value по порядку, для поиска и повторного показа
+    await cur.execute(
+        """
+        CREATE TABLE IF NOT EXISTS ticket_form_fields (
+            ticket_id INT NOT NULL,
+            position TINYINT UNSIGNED NOT NULL,
+            label VARCHAR(100) NOT NULL,
+            value TEXT NOT NULL,
+            PRIMARY KEY (ticket_id, position),
+            FULLTEXT KEY ft_form_fields_value (value),
+            CONSTRAINT fk_form_fields_ticket FOREIGN KEY (ticket_id)
+                REFERENCES tickets (id) ON DELETE CASCADE
+        )
+        """
+    )
+    # текст транскрипта кусками по пачке сообщений: FULLTEXT по небольшим строкам
+    await cur.execute(
+        """
+        CREATE TABLE IF NOT EXISTS ticket_search_chunks (
+            ticket_id INT NOT NULL,
+            chunk INT NOT NULL,
+            body MEDIUMTEXT NOT NULL,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+            PRIMARY KEY (ticket_id, chunk),
+            FULLTEXT KEY ft_search_chunks_body (body),
+            CONSTRAINT fk_search_chunks_ticket FOREIGN KEY (ticket_id)
+                REFERENCES tickets (id) ON DELETE CASCADE
+        )
+        """
+    )
+
+
+async def _007_ticket_fields(cur):
+    # поля, по которым ищут повторные обращения, — типизированно и с индексами
+    await cur.execute(
+        """
+        CREATE TABLE IF NOT EXISTS ticket_fields (
+            ticket_id INT PRIMARY KEY,
+            ticket_type VARCHAR(32) NOT NULL,
+            steam_id64 BIGINT UNSIGNED NULL,
+            violator_steam_id64 BIGINT UNSIGNED NULL,
+            violator_name VARCHAR(64) NULL,
+            admin_steam_id64 BIGINT UNSIGNED NULL,
+            admin_name VARCHAR(64) NULL,
+            incident_time VARCHAR(100) NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            KEY idx_ticket_fields_steam (steam_id64, ticket_type),
+            KEY idx_ticket_fields_violator_steam (violator_steam_id64),
+            KEY idx_ticket_fields_violator_name (violator_name),
+            KEY idx_ticket_fields_admin_steam (admin_steam_id64),
+            KEY idx_ticket_fields_admin_name (admin_name),
+            CONSTRAINT fk_ticket_fields_ticket FOREIGN KEY (ticket_id)
+                REFERENCES tickets (id) ON DELETE CASCADE
+        )
+        """
+    )
+
+
+async def _008_ticket_events(cur):
+    # журнал только дописывается; время — UTC с миллисекундами, проставляет бот
+    await cur.execute(
+        """
+        CREATE TABLE IF NOT EXISTS ticket_events (
+            id BIGINT AUTO_INCREMENT PRIMARY KEY,
+            ticket_id INT NOT NULL,
+            event VARCHAR(32) NOT NULL,
+            actor_id BIGINT NULL,
+            data JSON NULL,
+            created_at DATETIME(3) NOT NULL,
+            KEY idx_ticket_events_ticket (ticket_id, id),
+            KEY idx_ticket_events_actor (actor_id, created_at),
+            KEY idx_ticket_events_time (created_at, event)
+        )
+        """
+    )
+
+
+async def _009_ticket_stats(cur):
+    # отметки времени жизненного цикла; claimed_by не сбрасывается при закрытии
+    await _add_column(cur, "tickets", "claimed_at", "DATETIME NULL")
+    await _add_column(cur, "tickets", "claimed_by", "BIGINT NULL")
+    await _add_column(cur, "tickets", "first_response_at", "DATETIME NULL")
+    await _add_column(cur, "tickets", "first_responder_id", "BIGINT NULL")
+    await _add_column(cur, "tickets", "closed_at", "DATETIME NULL")
+    await _add_column(cur, "tickets", "closed_by", "BIGINT NULL")
+
+    # агрегаты по часу и дню (UTC); admin_id = 0 — событие без администратора
+    for table in ("ticket_stats_hourly", "ticket_stats_daily"):
+        await cur.execute(
+            f"""
+            CREATE TABLE IF NOT EXISTS {table} (
+                bucket DATETIME NOT NULL,
+                ticket_type VARCHAR(32) NOT NULL,
+                admin_id BIGINT NOT NULL DEFAULT 0,
+                created INT NOT NULL DEFAULT 0,
+                claimed INT NOT NULL DEFAULT 0,
+                responded INT NOT NULL DEFAULT 0,
+                closed INT NOT NULL DEFAULT 0,
+                claim_seconds BIGINT NOT NULL DEFAULT 0,
+                response_seconds BIGINT NOT NULL DEFAULT 0,
+                close_seconds BIGINT NOT NULL DEFAULT 0,
+                PRIMARY KEY (bucket, ticket_type, admin_id),
+                KEY idx_{table}_admin (admin_id, bucket)
+            )
+            """
+        )
+
+    # до какого события журнала агрегаты уже посчитаны
+    await cur.execute(
+        """
+        CREATE TABLE IF NOT EXISTS ticket_stats_state (
+            name VARCHAR(32) PRIMARY KEY,
+            last_event_id BIGINT NOT NULL DEFAULT 0,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+        )
+        """
+    )
+
+
+MIGRATIONS = [
+    (1, "create_tickets", _001_create_tickets),
+    (2, "ticket_columns", _002_ticket_columns),
+    (3, "ticket_indexes", _003_ticket_indexes),
+    (4, "open_ticket_unique", _004_open_ticket_unique),
+    (5, "transcript_exports", _005_transcript_exports),
+    (6, "ticket_search", _006_ticket_search),
+    (7, "ticket_fields", _007_ticket_fields),
+    (8, "ticket_events", _008_ticket_events),
+    (9, "ticket_stats", _009_ticket_stats),
+]
+
+SCHEMA_VERSION = MIGRATIONS[-1][0]
+
+
+# ================== QUERIES ==================
+
+async def _fetchrow(conn, query, args=None):
+    async with _timed_query(), conn.cursor(aiomysql.DictCursor) as cur:
+        await cur.execute(query, args)
+        return await cur.fetchone()
+
+
+async def _fetchall(conn, query, args=None):
+    async with _timed_query(), conn.cursor(aiomysql.DictCursor) as cur:
+        await cur.execute(query, args)
+        return await cur.fetchall()
+
+
+async def _execute(conn, query, args=None, return_lastrowid: bool = False):
+    async with _timed_query(), conn.cursor() as cur:
+        await cur.execute(query, args)
+        return cur.lastrowid if return_lastrowid else cur.rowcount
+
+
+async def _executemany(conn, query, args_seq):
+    args_seq = list(args_seq)
+    if not args_seq:
+        return 0
+
+    # INSERT ... VALUES aiomysql склеивает в один многострочный запрос
+    async with _timed_query(), conn.cursor() as cur:
+        await cur.executemany(query, args_seq)
+        return cur.rowcount
+
+
+class Transaction:
+    def __init__(self, conn):
+        self.conn = conn
+        self._rollback_callbacks = []
+
+    def on_rollback(self, callback):
+        self._rollback_callbacks.append(callback)
+
+    async def fetchrow(self, query, args=None):
+        return await _fetchrow(self.conn, query, args)
+
+    async def fetchall(self, query, args=None):
+        return await _fetchall(self.conn, query, args)
+
+    async def execute(self, query, args=None, return_lastrowid: bool = False):
+        return await _execute(self.conn, query, args, return_lastrowid)
+
+    async def executemany(self, query, args_seq):
+        return await _executemany(self.conn, query, args_seq)
+
+    async def rollback(self):
+        try:
+            await self.conn.rollback()
+        finally:
+            # откатываем и то, что успели поменять в памяти (кэш и т.п.)
+            for callback in reversed(self._rollback_callbacks):
+                callback()
+            self._rollback_callbacks.clear()
 
 
 class Database:
     pool: aiomysql.Pool = None
+    metrics: PoolMetrics = metrics
 
     @classmethod
-    async def connect(cls):
+    async def connect(cls, migrate: bool = DB_AUTO_MIGRATE):
         cls.pool = await aiomysql.create_pool(
             host=MYSQL_HOST,
             port=MYSQL_PORT,
             user=MYSQL_USER,
             password=MYSQL_PASSWORD,
             db=MYSQL_DATABASE,
-            autocommit=True
+            minsize=MYSQL_POOL_MINSIZE,
+            maxsize=MYSQL_POOL_MAXSIZE,
+            pool_recycle=MYSQL_POOL_RECYCLE,
+            connect_timeout=MYSQL_CONNECT_TIMEOUT,
+            autocommit=True,
+            # TIMESTAMP читаем и пишем в UTC, как и utcnow() бота
+            init_command="SET time_zone = '+00:00'"
         )
 
-        await cls.init_tables()
+        await cls.warmup()
+
+        if migrate:
+            await cls.migrate()
+
+        await cls.check_schema()
 
     @classmethod
-    async def init_tables(cls):
-        query = """
-        CREATE TABLE IF NOT EXISTS tickets (
-            id INT AUTO_INCREMENT PRIMARY KEY,
-            ticket_number INT NOT NULL,
-            ticket_type VARCHAR(32) NOT NULL,
-            ticket_letter CHAR(1) NOT NULL,
-            user_id BIGINT NOT NULL,
-            channel_id BIGINT,
-            status ENUM('open', 'closed') DEFAULT 'open',
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        );
-        """
-        await cls.execute(query)
-        print("✅ Tables checked / created")
+    async def warmup(cls):
+        # берём minsize соединений разом и пингуем, чтобы первый всплеск
+        # после рестарта не ждал TCP/auth-рукопожатий
+        connections = await asyncio.gather(
+            *(cls.pool.acquire() for _ in range(MYSQL_POOL_MINSIZE))
+        )
+
+        try:
+            await asyncio.gather(*(conn.ping() for conn in connections))
+        finally:
+            for conn in connections:
+                cls.pool.release(conn)
+
+        print(f"✅ MySQL pool warmed ({len(connections)}/{MYSQL_POOL_MAXSIZE})")
 
     @classmethod
-    async def fetchrow(cls, query, args=None):
-        async with cls.pool.acquire() as conn:
-            async with conn.cursor(aiomysql.DictCursor) as cur:
-                await cur.execute(query, args)
-                return await cur.fetchone()
+    @asynccontextmanager
+    async def acquire(cls):
+        started = time.perf_counter()
+
+        try:
+            conn = await asyncio.wait_for(cls.pool.acquire(), MYSQL_ACQUIRE_TIMEOUT)
+        except asyncio.TimeoutError:
+            cls.metrics.acquire_timeouts += 1
+            raise
+
+        waited = time.perf_counter() - started
+        cls.metrics.acquire_wait.add(waited)
+        record(DB_WAIT, waited)
+
+        try:
+            yield conn
+        finally:
+            cls.pool.release(conn)
+
+    @classmethod
+    def stats(cls) -> dict:
+        pool = cls.pool
+
+        return {
+            "size": pool.size if pool else 0,
+            "minsize": MYSQL_POOL_MINSIZE,
+            "maxsize": MYSQL_POOL_MAXSIZE,
+            "in_use": pool.size - pool.freesize if pool else 0,
+            "idle": pool.freesize if pool else 0,
+            "acquire_timeouts": cls.metrics.acquire_timeouts,
+            "query_errors": cls.metrics.query_errors,
+            "acquire_wait": cls.metrics.acquire_wait.summary(),
+            "query_latency": cls.metrics.query_latency.summary(),
+        }
+
+    @classmethod
+    async def schema_version(cls) -> int:
+        row = await cls.fetchrow(
+            """
+            SELECT 1 AS present FROM information_schema.TABLES
+            WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'schema_migrations'
+            """
+        )
+        if not row:
+            return 0
+
+        row = await cls.fetchrow("SELECT MAX(version) AS version FROM schema_migrations")
+        return row["version"] or 0
 
     @classmethod
-    async def execute(cls, query, args=None):
-        async with cls.pool.acquire() as conn:
+    async def migrate(cls):
+        async with cls.acquire() as conn:
             async with conn.cursor() as cur:
+                # несколько инстансов бота не должны мигрировать одновременно
+                await cur.execute("SELECT GET_LOCK('schema_migrations', 60)")
+                (locked,) = await cur.fetchone()
+                if not locked:
+                    raise RuntimeError("Could not acquire schema migration lock")
+
+                try:
+                    await cur.execute(
+                        """
+                        CREATE TABLE IF NOT EXISTS schema_migrations (
+                            version INT PRIMARY KEY,
+                            name VARCHAR(128) NOT NULL,
+                            applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                        )
+                        """
+                    )
+
+                    await cur.execute("SELECT version FROM schema_migrations")
+                    applied = {version for (version,) in await cur.fetchall()}
+
+                    for version, name, migration in MIGRATIONS:
+                        if version in applied:
+                            continue
+
+                        await migration(cur)
+                        await cur.execute(
+                            "INSERT INTO schema_migrations (version, name) VALUES (%s, %s)",
+                            (version, name)
+                        )
+                        print(f"✅ Migration {version:03d}_{name} applied")
+                finally:
+                    await cur.execute("SELECT RELEASE_LOCK('schema_migrations')")
+
+    @classmethod
+    async def check_schema(cls):
+        version = await cls.schema_version()
+
+        if version < SCHEMA_VERSION:
+            raise RuntimeError(
+                f"Database schema is out of date ({version} < {SCHEMA_VERSION}). "
+                f"Run: python -m core.database migrate"
+            )
+
+        if version > SCHEMA_VERSION:
+            raise RuntimeError(
+                f"Database schema ({version}) is newer than this code ({SCHEMA_VERSION})"
+            )
+
+        print(f"✅ Database schema up to date (v{version})")
+
+    @classmethod
+    async def fetchrow(cls, query, args=None):
+        async with cls.acquire() as conn:
+            return await _fetchrow(conn, query, args)
+
+    @classmethod
+    async def fetchall(cls, query, args=None):
+        async with cls.acquire() as conn:
+            return await _fetchall(conn, query, args)
+
+    @classmethod
+    async def execute(cls, query, args=None, return_lastrowid: bool = False):
+        async with cls.acquire() as conn:
+            return await _execute(conn, query, args, return_lastrowid)
+
+    @classmethod
+    async def executemany(cls, query, args_seq):
+        async with cls.acquire() as conn:
+            return await _executemany(conn, query, args_seq)
+
+    @classmethod
+    async def iterate(cls, query, args=None, batch_size: int = 500):
+        # серверный курсор: строки приходят пачками, весь результат в память не грузим
+        async with cls.acquire() as conn:
+            async with conn.cursor(aiomysql.SSDictCursor) as cur:
                 await cur.execute(query, args)
 
+                while True:
+                    rows = await cur.fetchmany(batch_size)
+                    if not rows:
+                        break
+
+                    for row in rows:
+                        yield row
+
+    @classmethod
+    @asynccontextmanager
+    async def transaction(cls):
+        async with cls.acquire() as conn:
+            tx = Transaction(conn)
+            await conn.begin()
+
+            try:
+                yield tx
+                await conn.commit()
+            except BaseException:
+                await tx.rollback()
+                raise
+
     @classmethod
     async def close(cls):
         if cls.pool:
             cls.pool.close()
             await cls.pool.wait_closed()
             print("🛑 MySQL pool closed")
+
+
+if __name__ == "__main__":
+    import asyncio
+    import sys
+
+    async def _migrate():
+        await Database.connect(migrate=True)
+        await Database.close()
+
+    if sys.argv[1:] != ["migrate"]:
+        sys.exit("Usage: python -m core.database migrate")
+
+    asyncio.run(_migrate())
@@ -0,0 +1,275 @@
+import asyncio
+import functools
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+
+import discord
+from discord.webhook.async_ import async_context
+
+from config import INTERACTION_SLOW_SECONDS, INTERACTION_SLOW_ACK_SECONDS
+from core.tracing import ACK, REST, current_trace as _current_trace, stage
+
+METRICS_PREFIX = "ticketbot"
+
+# границы бакетов (сек); 3 — дедлайн Discord на подтверждение взаимодействия
+BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.0, 2.5, 3.0, 5.0, 10.0)
+ACK_DEADLINE = 3.0
+
+
+class Histogram:
+    def __init__(self):
+        self.buckets = [0] * (len(BUCKETS) + 1)
+        self.count = 0
+        self.total = 0.0
+
+    def observe(self, seconds: float):
+        self.buckets[bisect_left(BUCKETS, seconds)] += 1
+        self.count += 1
+        self.total += seconds
+
+    def cumulative(self):
+        running = 0
+        for bound, count in zip((*BUCKETS, "+Inf"), self.buckets):
+            running += count
+            yield bound, running
+
+
+class Trace:
+    def __init__(self, handler: str, interaction: discord.Interaction = None):
+        self.handler = handler
+        self.interaction = interaction
+        # фоновые задачи, созданные из обработчика, наследуют контекст — их не считаем
+        self.task = asyncio.current_task()
+        self.started = time.perf_counter()
+        # stage -> [секунды, вызовы]
+        self.stages = {}
+        # сколько прошло от создания взаимодействия до ответа (по часам Discord)
+        self.ack_age = None
+
+    def add(self, stage: str, seconds: float):
+        if asyncio.current_task() is not self.task:
+            return
+
+        entry = self.stages.setdefault(stage, [0.0, 0])
+        entry[0] += seconds
+        entry[1] += 1
+
+        if stage == ACK:
+            self.acknowledge()
+
+    def acknowledge(self):
+        if self.ack_age is None and self.interaction is not None:
+            self.ack_age = (discord.utils.utcnow() - self.interaction.created_at).total_seconds()
+
+    def describe(self, duration: float) -> str:
+        parts = [
+            f"{stage} {seconds:.2f}s ×{calls}"
+            for stage, (seconds, calls) in sorted(self.stages.items())
+        ]
+        other = duration - sum(seconds for seconds, _ in self.stages.values())
+        parts.append(f"other {max(other, 0.0):.2f}s")
+
+        ack = f"ack at {self.ack_age:.2f}s" if self.ack_age is not None else "not acknowledged"
+        return f"{self.handler}: {duration:.2f}s, {ack} — {', '.join(parts)}"
+
+
+def begin(interaction: discord.Interaction):
+    # проверки до обработчика (права, подтверждение) попадают в его же трейс
+    _current_trace.set(Trace(None, interaction))
+
+
+def reject(handler: str):
+    # проверка отклонила взаимодействие: обработчика не будет, трейс закрываем здесь
+    current = _current_trace.get()
+    if current is None or current.handler is not None or current.task is not asyncio.current_task():
+        return
+
+    current.handler = handler
+    _current_trace.set(None)
+
+    InteractionMetrics.increment("interaction_rejected_total", handler=handler)
+    InteractionMetrics.finish(current)
+
+
+def record_auto_ack():
+    # подтверждение отправил сторож: обработчик сам не уложился в бюджет
+    current = _current_trace.get()
+    if current is not None:
+        current.acknowledge()
+        InteractionMetrics.increment(
+            "interaction_auto_ack_total", handler=current.handler or "unknown"
+        )
+
+
+@contextmanager
+def trace(handler: str, interaction: discord.Interaction = None):
+    current = _current_trace.get()
+
+    # трейс, начатый в interaction_check этой же задачи, продолжаем
+    if current is not None and current.handler is None and current.task is asyncio.current_task():
+        current.handler = handler
+    else:
+        current = Trace(handler, interaction)
+
+    token = _current_trace.set(current)
+
+    try:
+        yield current
+    except Exception:
+        InteractionMetrics.increment("interaction_errors_total", handler=handler)
+        raise
+    finally:
+        _current_trace.reset(token)
+        InteractionMetrics.finish(current)
+
+
+def traced(func):
+    # обработчик взаимодействия: имя метрики — Class.method
+    handler = func.__qualname__
+
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs):
+        interaction = next(
+            (arg for arg in args if isinstance(arg, discord.Interaction)), None
+        )
+
+        with trace(handler, interaction):
+            return await func(*args, **kwargs)
+
+    return wrapper
+
+
+def _timed_request(request):
+    @functools.wraps(request)
+    async def wrapper(route, *args, **kwargs):
+        # ответ на взаимодействие — POST /interactions/{id}/{token}/callback
+        name = ACK if route.path.endswith("/callback") else REST
+        with stage(name):
+            return await request(route, *args, **kwargs)
+
+    return wrapper
+
+
+def _flatten(prefix: str, values: dict):
+    for key, value in values.items():
+        name = f"{prefix}_{key}"
+        if isinstance(value, dict):
+            yield from _flatten(name, value)
+        elif isinstance(value, (int, float)):
+            yield name, value
+
+
+def _labels(labels: tuple) -> str:
+    return ",".join(f'{key}="{value}"' for key, value in labels)
+
+
+class InteractionMetrics:
+    # (метрика, labels) -> Histogram / счётчик
+    histograms: dict = {}
+    counters: dict = {}
+    # префикс -> функция, возвращающая dict со снимком состояния
+    gauges: dict = {}
+
+    _installed = False
+
+    @classmethod
+    def install(cls, bot):
+        # REST бота идёт через bot.http, ответы на взаимодействия и вебхуки —
+        # через адаптер вебхуков discord.py
+        if cls._installed:
+            return
+
+        bot.http.request = _timed_request(bot.http.request)
+
+        adapter = async_context.get()
+        adapter.request = _timed_request(adapter.request)
+
+        cls._installed = True
+
+    @classmethod
+    def register(cls, prefix: str, collect):
+        cls.gauges[prefix] = collect
+
+    # ================== RECORD ==================
+
+    @classmethod
+    def observe(cls, name: str, seconds: float, **labels):
+        key = (name, tuple(labels.items()))
+
+        histogram = cls.histograms.get(key)
+        if histogram is None:
+            histogram = cls.histograms[key] = Histogram()
+
+        histogram.observe(seconds)
+
+    @classmethod
+    def increment(cls, name: str, **labels):
+        key = (name, tuple(labels.items()))
+        cls.counters[key] = cls.counters.get(key, 0) + 1
+
+    @classmethod
+    def finish(cls, trace: Trace):
+        duration = time.perf_counter() - trace.started
+        handler = trace.handler
+
+        cls.observe("interaction_duration_seconds", duration, handler=handler)
+
+        for name, (seconds, _) in trace.stages.items():
+            cls.observe("interaction_stage_seconds", seconds, handler=handler, stage=name)
+
+        if trace.ack_age is None:
+            cls.increment("interaction_unacknowledged_total", handler=handler)
+        else:
+            cls.observe("interaction_ack_seconds", trace.ack_age, handler=handler)
+            if trace.ack_age > ACK_DEADLINE:
+                cls.increment("interaction_ack_late_total", handler=handler)
+
+        if duration >= INTERACTION_SLOW_SECONDS or (
+            trace.ack_age is not None and trace.ack_age >= INTERACTION_SLOW_ACK_SECONDS
+        ):
+            print(f"🐢 Slow interaction {trace.describe(duration)}")
+
+    # ================== EXPORT ==================
+
+    @classmethod
+    def render(cls) -> str:
+        # текстовый формат Prometheus
+        lines = []
+
+        by_name = {}
+        for (name, labels), histogram in sorted(cls.histograms.items()):
+            by_name.setdefault(name, []).append((labels, histogram))
+
+        for name, series in by_name.items():
+            metric = f"{METRICS_PREFIX}_{name}"
+            lines.append(f"# TYPE {metric} histogram")
+
+            for labels, histogram in series:
+                for bound, count in histogram.cumulative():
+                    bucket_labels = _labels((*labels, ("le", bound)))
+                    lines.append(f"{metric}_bucket{{{bucket_labels}}} {count}")
+
+                lines.append(f"{metric}_sum{{{_labels(labels)}}} {histogram.total:.6f}")
+                lines.append(f"{metric}_count{{{_labels(labels)}}} {histogram.count}")
+
+        declared = set()
+        for (name, labels), value in sorted(cls.counters.items()):
+            metric = f"{METRICS_PREFIX}_{name}"
+            if metric not in declared:
+                lines.append(f"# TYPE {metric} counter")
+                declared.add(metric)
+            lines.append(f"{metric}{{{_labels(labels)}}} {value}")
+
+        for prefix, collect in cls.gauges.items():
+            try:
+                values = collect()
+            except Exception as e:
+                print(f"⚠️ Metrics collector {prefix} failed: {e!r}")
+                continue
+
+            for metric, value in _flatten(f"{METRICS_PREFIX}_{prefix}", values):
+                lines.append(f"# TYPE {metric} gauge")
+                lines.append(f"{metric} {value}")
+
+        return "\n".join(lines) + "\n"
@@ -0,0 +1,126 @@
+import re
+
+from core.database import Database
+from utils.steam import parse_steamids
+
+SEARCH_LIMIT = 10
+
+# совпадение в полях заявки весит больше, чем упоминание в переписке
+FORM_WEIGHT = 2.0
+
+_WORD_RE = re.compile(r"\w+")
+
+
+def fulltext_query(text: str) -> str:
+    # операторы BOOLEAN MODE от пользователя не пропускаем: каждое слово обязательно,
+    # составные токены (STEAM_0:1:123, ники с точками) ищем фразой
+    terms = []
+    tokens = text.split()
+
+    for token, steam_id64 in zip(tokens, parse_steamids(tokens)):
+        words = _WORD_RE.findall(token)
+
+        if len(words) == 1:
+            term = f"{words[0]}*"
+        elif words:
+            term = '"' + " ".join(words) + '"'
+        else:
+            continue
+
+        # SteamID в заявках хранится как SteamID64 — ищем в любой из двух форм
+        if steam_id64 is not None and words != [str(steam_id64)]:
+            term = f"({term} {steam_id64})"
+
+        terms.append(f"+{term}")
+
+    return " ".join(terms)
+
+
+def record_text(record: dict) -> str:
+    parts = [record["author_name"], record["content"]]
+
+    for attachment in record["attachments"]:
+        parts.append(attachment["filename"])
+
+    for embed in record["embeds"]:
+        parts.append(embed["title"])
+        parts.append(embed["description"])
+
+        for field in embed["fields"]:
+            parts.append(field["name"])
+            parts.append(field["value"])
+
+    return "\n".join(part for part in parts if part)
+
+
+class TicketSearch:
+    # ================== INDEX ==================
+
+    @classmethod
+    async def store_form(cls, ticket_id: int, fields: dict, tx=None):
+        db = tx or Database
+
+        await db.executemany(
+            """
+            INSERT INTO ticket_form_fields (ticket_id, position, label, value)
+            VALUES (%s, %s, %s, %s)
+            """,
+            [
+                (ticket_id, position, label, str(value))
+                for position, (label, value) in enumerate(fields.items())
+            ]
+        )
+
+    @classmethod
+    async def index_chunk(cls, ticket_id: int, chunk: int, records: list):
+        # вызывается на каждую пачку при записи транскрипта: индекс растёт вместе с файлом
+        body = "\n".join(record_text(record) for record in records)
+
+        await Database.execute(
+            """
+            INSERT INTO ticket_search_chunks (ticket_id, chunk, body)
+            VALUES (%s, %s, %s)
+            ON DUPLICATE KEY UPDATE body = VALUES(body)
+            """,
+            (ticket_id, chunk, body)
+        )
+
+    @classmethod
+    async def finish_index(cls, ticket_id: int, chunks: int):
+        # транскрипт мог стать короче (удалённые каналы, перегенерация) — хвост убираем
+        await Database.execute(
+            "DELETE FROM ticket_search_chunks WHERE ticket_id = %s AND chunk >= %s",
+            (ticket_id, chunks)
+        )
+
+    # ================== SEARCH ==================
+
+    @classmethod
+    async def search(cls, text: str, limit: int = SEARCH_LIMIT) -> list:
+        query = fulltext_query(text)
+        if not query:
+            return []
+
+        return await Database.fetchall(
+            """
+            SELECT t.id, t.ticket_number, t.ticket_letter, t.ticket_type,
+                   t.user_id, t.channel_id, t.status, t.created_at,
+                   SUM(hits.score) AS score
+            FROM (
+                SELECT ticket_id,
+                       MATCH (value) AGAINST (%s IN BOOLEAN MODE) * %s AS score
+                FROM ticket_form_fields
+                WHERE MATCH (value) AGAINST (%s IN BOOLEAN MODE)
+                UNION ALL
+                SELECT ticket_id,
+                       MATCH (body) AGAINST (%s IN BOOLEAN MODE) AS score
+                FROM ticket_search_chunks
+                WHERE MATCH (body) AGAINST (%s IN BOOLEAN MODE)
+            ) AS hits
+            JOIN tickets t ON t.id = hits.ticket_id
+            GROUP BY t.id
+            ORDER BY score DESC, t.id DESC
+            LIMIT %s
+            """,
+            (query, FORM_WEIGHT, query, query, query, limit)
+        )
@@ -0,0 +1,269 @@
+from collections import OrderedDict
+
+import aiomysql
+
+from config import TICKET_CACHE_SIZE
+from core.database import Database
+from core.ticket_events import utcnow
+
+# колонки, которые можно менять через update()
+MUTABLE_COLUMNS = {
+    "ticket_number",
+    "channel_id",
+    "status",
+    "assigned_admin_id",
+    "transcript_created",
+    "claimed_at",
+    "claimed_by",
+    "first_response_at",
+    "first_responder_id",
+    "closed_at",
+    "closed_by",
+}
+
+# резерв без канала старше этого — след упавшего create_ticket
+STALE_RESERVATION_MINUTES = 10
+
+
+class TicketAlreadyOpen(Exception):
+    def __init__(self, ticket: dict):
+        super().__init__(f"User {ticket['user_id']} already has an open ticket")
+        self.ticket = ticket
+
+
+class TicketCache:
+    # открытые тикеты держим всегда, закрытые — LRU
+    open: dict = {}
+    closed: OrderedDict = OrderedDict()
+    max_closed: int = TICKET_CACHE_SIZE
+
+    # индексы только по открытым тикетам (включая резервы без канала)
+    open_by_user: dict = {}
+    claimed_by_admin: dict = {}
+
+    @classmethod
+    async def warm(cls):
+        await Database.execute(
+            """
+            DELETE FROM tickets
+            WHERE status = 'open' AND channel_id IS NULL
+              AND created_at < NOW() - INTERVAL %s MINUTE
+            """,
+            (STALE_RESERVATION_MINUTES,)
+        )
+
+        rows = await Database.fetchall("SELECT * FROM tickets WHERE status = 'open'")
+
+        cls.open.clear()
+        cls.closed.clear()
+        cls.open_by_user.clear()
+        cls.claimed_by_admin.clear()
+
+        for row in rows:
+            cls._store(row)
+
+        print(f"✅ Ticket cache warmed ({len(cls.open)} open)")
+
+    # ================== READ ==================
+
+    @classmethod
+    async def get(cls, channel_id: int):
+        ticket = cls.peek(channel_id)
+        if ticket:
+            return ticket
+
+        # бот — единственный писатель, открытые тикеты уже в кэше;
+        # в БД идём только за закрытыми, вытесненными из LRU
+        ticket = await Database.fetchrow(
+            "SELECT * FROM tickets WHERE channel_id = %s",
+            (channel_id,)
+        )
+        if ticket and ticket["status"] != "deleted":
+            cls._store(ticket)
+
+        return ticket
+
+    @classmethod
+    def peek(cls, channel_id: int):
+        ticket = cls.open.get(channel_id)
+        if ticket:
+            return ticket
+
+        ticket = cls.closed.get(channel_id)
+        if ticket:
+            cls.closed.move_to_end(channel_id)
+
+        return ticket
+
+    @classmethod
+    def get_claimed_by_admin(cls, admin_id: int):
+        return cls.claimed_by_admin.get(admin_id)
+
+    # ================== WRITE ==================
+
+    @classmethod
+    async def reserve(cls, ticket_type: str, letter: str, user_id: int, tx=None):
+        existing = cls.open_by_user.get(user_id)
+        if existing:
+            raise TicketAlreadyOpen(existing)
+
+        ticket = {
+            "id": None,
+            "ticket_number": 0,
+            "ticket_type": ticket_type,
+            "ticket_letter": letter,
+            "user_id": user_id,
+            "channel_id": None,
+            "status": "open",
+            "created_at": utcnow(),
+            "assigned_admin_id": None,
+            "transcript_created": 0,
+            "claimed_at": None,
+            "claimed_by": None,
+            "first_response_at": None,
+            "first_responder_id": None,
+            "closed_at": None,
+            "closed_by": None,
+        }
+
+        # занимаем слот в памяти до первого await: повторный сабмит модалки
+        # в этом же процессе отсекается без похода в БД
+        cls._store(ticket)
+
+        db = tx or Database
+
+        try:
+            ticket["id"] = await db.execute(
+                """
+                INSERT INTO tickets (ticket_type, ticket_letter, user_id, status)
+                VALUES (%s, %s, %s, 'open')
+                """,
+                (ticket_type, letter, user_id),
+                return_lastrowid=True
+            )
+            # номер тикета = AUTO_INCREMENT резерва: известен до создания канала
+            ticket["ticket_number"] = ticket["id"]
+        except aiomysql.IntegrityError as e:
+            cls._discard(ticket)
+
+            # uq_tickets_open_user: открытый тикет уже есть (другой процесс / ретрай Discord)
+            if e.args and e.args[0] == 1062:
+                row = await Database.fetchrow(
+                    "SELECT * FROM tickets WHERE user_id = %s AND status = 'open'",
+                    (user_id,)
+                )
+                if row:
+                    cls._store(row)
+                    raise TicketAlreadyOpen(row) from e
+            raise
+        except BaseException:
+            cls._discard(ticket)
+            raise
+
+        if tx:
+            tx.on_rollback(lambda: cls._discard(ticket))
+
+        return ticket
+
+    @classmethod
+    async def attach_channel(cls, ticket: dict, channel_id: int):
+        await Database.execute(
+            "UPDATE tickets SET channel_id = %s, ticket_number = %s WHERE id = %s",
+            (channel_id, ticket["ticket_number"], ticket["id"])
+        )
+
+        cls._discard(ticket)
+        ticket["channel_id"] = channel_id
+        cls._store(ticket)
+
+        return ticket
+
+    @classmethod
+    async def release(cls, ticket: dict):
+        cls._discard(ticket)
+
+        if ticket["id"] is not None:
+            await Database.execute(
+                "DELETE FROM tickets WHERE id = %s",
+                (ticket["id"],)
+            )
+
+    @classmethod
+    async def update(cls, channel_id: int, tx=None, **fields):
+        unknown = set(fields) - MUTABLE_COLUMNS
+        if unknown:
+            raise ValueError(f"Unknown ticket columns: {', '.join(sorted(unknown))}")
+
+        ticket = cls.peek(channel_id)
+        previous = dict(ticket) if ticket else None
+
+        # сначала кэш (без await — проверка+запись атомарны для лупа), потом MySQL
+        if ticket:
+            cls._discard(ticket)
+            ticket.update(fields)
+            if ticket["status"] != "deleted":
+                cls._store(ticket)
+
+        def revert():
+            if previous:
+                cls._discard(ticket)
+                ticket.clear()
+                ticket.update(previous)
+                cls._store(ticket)
+
+        assignments = ", ".join(f"{column} = %s" for column in fields)
+        db = tx or Database
+
+        try:
+            await db.execute(
+                f"UPDATE tickets SET {assignments} WHERE channel_id = %s",
+                (*fields.values(), channel_id)
+            )
+        except Exception:
+            revert()
+            raise
+
+        # в транзакции запись ещё может откатиться уже после UPDATE
+        if tx:
+            tx.on_rollback(revert)
+
+        return ticket
+
+    # ================== INDEXES ==================
+
+    @classmethod
+    def _store(cls, ticket: dict):
+        channel_id = ticket["channel_id"]
+
+        if ticket["status"] == "open":
+            cls.open_by_user[ticket["user_id"]] = ticket
+
+            if ticket.get("assigned_admin_id"):
+                cls.claimed_by_admin[ticket["assigned_admin_id"]] = ticket
+
+            if channel_id:
+                cls.closed.pop(channel_id, None)
+                cls.open[channel_id] = ticket
+            return
+
+        cls.open.pop(channel_id, None)
+        cls.closed[channel_id] = ticket
+        cls.closed.move_to_end(channel_id)
+
+        while len(cls.closed) > cls.max_closed:
+            cls.closed.popitem(last=False)
+
+    @classmethod
+    def _discard(cls, ticket: dict):
+        channel_id = ticket["channel_id"]
+
+        if channel_id:
+            cls.open.pop(channel_id, None)
+            cls.closed.pop(channel_id, None)
+
+        if cls.open_by_user.get(ticket["user_id"]) is ticket:
+            del cls.open_by_user[ticket["user_id"]]
+
+        admin_id = ticket.get("assigned_admin_id")
+        if admin_id and cls.claimed_by_admin.get(admin_id) is ticket:
+            del cls.claimed_by_admin[admin_id]
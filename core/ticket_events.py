@@ -0,0 +1,259 @@
+import asyncio
+import json
+from datetime import datetime, timezone
+
+import aiomysql
+
+from config import TICKET_EVENTS_BATCH_SIZE, TICKET_EVENTS_FLUSH_INTERVAL
+from core.database import Database
+
+CREATED = "created"
+CLAIMED = "claimed"
+CLOSED = "closed"
+REOPENED = "reopened"
+DELETED = "deleted"
+TRANSCRIPT_CREATED = "transcript_created"
+
+# если MySQL недоступен, буфер не растёт бесконечно
+MAX_BUFFERED = 10000
+# после стольких неудачных попыток пачку пишем построчно, пропуская битые строки
+FLUSH_ATTEMPTS = 3
+
+INSERT_EVENT = """
+    INSERT INTO ticket_events (ticket_id, event, actor_id, data, created_at)
+    VALUES (%s, %s, %s, %s, %s)
+"""
+
+
+def utcnow() -> datetime:
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def apply_event(state: dict, event: dict) -> dict:
+    # свёртка журнала: состояние тикета после события
+    kind = event["event"]
+    data = event["data"] or {}
+    at = event["created_at"]
+
+    if kind == CREATED:
+        state.update(
+            status="open",
+            user_id=data.get("user_id", event["actor_id"]),
+            ticket_type=data.get("ticket_type"),
+            channel_id=data.get("channel_id"),
+            created_at=at,
+        )
+    elif kind == CLAIMED:
+        state.update(assigned_admin_id=event["actor_id"], claimed_at=at)
+    elif kind == CLOSED:
+        state.update(
+            status="closed",
+            assigned_admin_id=None,
+            closed_at=at,
+            closed_by=event["actor_id"],
+        )
+    elif kind == REOPENED:
+        state.update(status="open", closed_at=None, closed_by=None, reopened_at=at)
+    elif kind == DELETED:
+        state.update(status="deleted", deleted_at=at)
+    elif kind == TRANSCRIPT_CREATED:
+        state.update(transcript_created=1, transcript_digest=data.get("digest"))
+
+    state["events"] = state.get("events", 0) + 1
+    state["updated_at"] = at
+    return state
+
+
+class TicketEvents:
+    _buffer: list = []
+    _wakeup: asyncio.Event = None
+    _worker: asyncio.Task = None
+    _lock = asyncio.Lock()
+    _failures: int = 0
+
+    dropped: int = 0
+    written: int = 0
+
+    # ================== WRITE ==================
+
+    @classmethod
+    def record(cls, ticket_id: int, event: str, actor_id: int = None, **data):
+        # без await: обработчик кнопки не ждёт записи в БД
+        cls.start()
+
+        # новые отбрасываем, а не старые: сброс удаляет записанное по позиции
+        if len(cls._buffer) >= MAX_BUFFERED:
+            cls.dropped += 1
+            return
+
+        cls._buffer.append((
+            ticket_id,
+            event,
+            actor_id,
+            json.dumps(data, ensure_ascii=False, default=str) if data else None,
+            utcnow(),
+        ))
+
+        if len(cls._buffer) >= TICKET_EVENTS_BATCH_SIZE:
+            cls._wakeup.set()
+
+    @classmethod
+    def start(cls):
+        if cls._wakeup is None:
+            cls._wakeup = asyncio.Event()
+
+        if cls._worker is None or cls._worker.done():
+            cls._worker = asyncio.create_task(cls._run())
+
+    @classmethod
+    async def close(cls):
+        if cls._worker is not None:
+            cls._worker.cancel()
+            try:
+                await cls._worker
+            except asyncio.CancelledError:
+                pass
+            cls._worker = None
+
+        try:
+            await cls.flush()
+        except Exception as e:
+            print(f"⚠️ {len(cls._buffer)} ticket events lost on shutdown: {e!r}")
+
+    @classmethod
+    async def _run(cls):
+        while True:
+            try:
+                await asyncio.wait_for(cls._wakeup.wait(), TICKET_EVENTS_FLUSH_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+            cls._wakeup.clear()
+
+            try:
+                await cls.flush()
+            except Exception as e:
+                # события остались в буфере — повторим на следующем тике
+                print(f"⚠️ Ticket events flush failed: {e!r}")
+
+    @classmethod
+    async def flush(cls):
+        # фоновый сброс и replay() не должны записать одну пачку дважды
+        async with cls._lock:
+            while cls._buffer:
+                batch = cls._buffer[:TICKET_EVENTS_BATCH_SIZE]
+
+                try:
+                    await Database.executemany(INSERT_EVENT, batch)
+                except Exception:
+                    cls._failures += 1
+                    if cls._failures < FLUSH_ATTEMPTS:
+                        raise
+                    # одна битая строка не должна держать весь буфер вечно;
+                    # счётчик сбрасываем и при обрыве, иначе после восстановления MySQL
+                    # первый же сбой пачки сразу уходил бы в построчную запись
+                    cls._failures = 0
+                    await cls._insert_rows(batch)
+                else:
+                    # удаляем только записанное: пока шёл INSERT, в буфер могли добавить
+                    del cls._buffer[:len(batch)]
+                    cls.written += len(batch)
+
+                cls._failures = 0
+
+    @classmethod
+    async def _insert_rows(cls, batch: list):
+        for row in batch:
+            try:
+                await Database.execute(INSERT_EVENT, row)
+                cls.written += 1
+            except aiomysql.OperationalError:
+                # MySQL недоступен — строка не виновата, остаток остаётся в буфере
+                raise
+            except aiomysql.Error as e:
+                cls.dropped += 1
+                print(f"⚠️ Ticket event dropped {row[:3]}: {e!r}")
+
+            # строку убираем сразу: при обрыве на середине записанное не повторится
+            del cls._buffer[0]
+
+    # ================== READ ==================
+
+    @classmethod
+    async def history(cls, ticket_id: int) -> list:
+        # свои ещё не сброшенные события тоже должны быть видны
+        await cls.flush()
+
+        rows = await Database.fetchall(
+            """
+            SELECT id, ticket_id, event, actor_id, data, created_at
+            FROM ticket_events WHERE ticket_id = %s ORDER BY id
+            """,
+            (ticket_id,)
+        )
+
+        for row in rows:
+            row["data"] = json.loads(row["data"]) if row["data"] else None
+
+        return rows
+
+    @classmethod
+    async def replay(cls, ticket_id: int) -> dict:
+        state = {"ticket_id": ticket_id}
+
+        for event in await cls.history(ticket_id):
+            apply_event(state, event)
+
+        return state
+
+    @classmethod
+    async def by_admin(cls, admin_id: int, since: datetime = None, until: datetime = None) -> list:
+        # idx_ticket_events_actor: (actor_id, created_at)
+        conditions = ["actor_id = %s"]
+        args = [admin_id]
+
+        if since:
+            conditions.append("created_at >= %s")
+            args.append(since)
+        if until:
+            conditions.append("created_at < %s")
+            args.append(until)
+
+        where = " AND ".join(conditions)
+
+        return await Database.fetchall(
+            f"""
+            SELECT id, ticket_id, event, actor_id, created_at FROM ticket_events
+            WHERE {where}
+            ORDER BY created_at
+            """,
+            args
+        )
+
+    @classmethod
+    async def between(cls, since: datetime, until: datetime, event: str = None) -> list:
+        if event:
+            return await Database.fetchall(
+                """
+                SELECT id, ticket_id, event, actor_id, created_at FROM ticket_events
+                WHERE created_at >= %s AND created_at < %s AND event = %s
+                ORDER BY created_at
+                """,
+                (since, until, event)
+            )
+
+        return await Database.fetchall(
+            """
+            SELECT id, ticket_id, event, actor_id, created_at FROM ticket_events
+            WHERE created_at >= %s AND created_at < %s
+            ORDER BY created_at
+            """,
+            (since, until)
+        )
+
+    @classmethod
+    def stats(cls) -> dict:
+        return {
+            "buffered": len(cls._buffer),
+            "written": cls.written,
+            "dropped": cls.dropped,
+        }
@@ -0,0 +1,108 @@
+from core.database import Database
+from utils.steam import parse_steamids
+
+# подпись поля в модалке -> колонка ticket_fields
+STEAM_FIELDS = ("SteamID", "Ваш SteamID")
+TIME_FIELDS = ("Дата наказания", "Время")
+
+# "SteamID / Ник": распознанный SteamID идёт в *_steam_id64, остальное — в *_name
+IDENTITY_FIELDS = {
+    "Нарушитель": "violator",
+    "Администратор": "admin",
+}
+
+NAME_MAX_LENGTH = 64
+TIME_MAX_LENGTH = 100
+
+
+def extract_fields(ticket_type: str, fields: dict) -> dict:
+    row = {
+        "ticket_type": ticket_type,
+        "steam_id64": None,
+        "violator_steam_id64": None,
+        "violator_name": None,
+        "admin_steam_id64": None,
+        "admin_name": None,
+        "incident_time": None,
+    }
+
+    # распознаём одной пачкой только поля, где может быть SteamID
+    labels = [label for label in fields if label in STEAM_FIELDS or label in IDENTITY_FIELDS]
+    steam_ids = dict(zip(labels, parse_steamids(fields[label] for label in labels)))
+
+    for label, value in fields.items():
+        if label in STEAM_FIELDS:
+            row["steam_id64"] = steam_ids[label]
+        elif label in TIME_FIELDS:
+            row["incident_time"] = value[:TIME_MAX_LENGTH]
+        elif label in IDENTITY_FIELDS:
+            prefix = IDENTITY_FIELDS[label]
+            steam_id64 = steam_ids[label]
+
+            if steam_id64 is not None:
+                row[f"{prefix}_steam_id64"] = steam_id64
+            else:
+                row[f"{prefix}_name"] = value.strip()[:NAME_MAX_LENGTH]
+
+    return row
+
+
+class TicketFields:
+    @classmethod
+    async def store(cls, ticket_id: int, ticket_type: str, fields: dict, tx=None):
+        row = extract_fields(ticket_type, fields)
+        columns = ", ".join(row)
+        placeholders = ", ".join(["%s"] * len(row))
+        db = tx or Database
+
+        await db.execute(
+            f"""
+            INSERT INTO ticket_fields (ticket_id, {columns})
+            VALUES (%s, {placeholders})
+            """,
+            (ticket_id, *row.values())
+        )
+
+        return row
+
+    # ================== LOOKUPS ==================
+
+    @classmethod
+    async def count_by_steamid(cls, steam_id64: int, ticket_type: str = None) -> int:
+        if ticket_type:
+            row = await Database.fetchrow(
+                """
+                SELECT COUNT(*) AS total FROM ticket_fields
+                WHERE steam_id64 = %s AND ticket_type = %s
+                """,
+                (steam_id64, ticket_type)
+            )
+        else:
+            row = await Database.fetchrow(
+                "SELECT COUNT(*) AS total FROM ticket_fields WHERE steam_id64 = %s",
+                (steam_id64,)
+            )
+
+        return row["total"]
+
+    @classmethod
+    async def reports_against(cls, steam_id64: int = None, name: str = None) -> list:
+        # жалобы на игрока или администратора: по SteamID или по нику
+        if steam_id64 is not None:
+            condition = "violator_steam_id64 = %s OR admin_steam_id64 = %s"
+            args = (steam_id64, steam_id64)
+        else:
+            condition = "violator_name = %s OR admin_name = %s"
+            args = (name, name)
+
+        return await Database.fetchall(
+            f"""
+            SELECT t.id, t.ticket_number, t.ticket_letter, t.ticket_type,
+                   t.status, t.created_at
+            FROM ticket_fields f
+            JOIN tickets t ON t.id = f.ticket_id
+            WHERE {condition}
+            ORDER BY t.id DESC
+            """,
+            args
+        )
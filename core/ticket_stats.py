@@ -0,0 +1,170 @@
+import json
+from datetime import datetime
+
+from core.database import Database
+from core.ticket_events import utcnow
+
+# сколько событий журнала агрегируем за одну транзакцию
+ROLLUP_BATCH_SIZE = 5000
+STATE_NAME = "rollup"
+
+METRICS = (
+    "created",
+    "claimed",
+    "responded",
+    "closed",
+    "claim_seconds",
+    "response_seconds",
+    "close_seconds",
+)
+
+HOURLY_TABLE = "ticket_stats_hourly"
+DAILY_TABLE = "ticket_stats_daily"
+
+UPSERT = """
+    INSERT INTO {table} (bucket, ticket_type, admin_id, {columns})
+    VALUES (%s, %s, %s, {placeholders})
+    ON DUPLICATE KEY UPDATE {updates}
+""".format(
+    table="{table}",
+    columns=", ".join(METRICS),
+    placeholders=", ".join(["%s"] * len(METRICS)),
+    updates=", ".join(f"{metric} = {metric} + VALUES({metric})" for metric in METRICS)
+)
+
+
+def seconds_since(created_at: datetime) -> int:
+    # created_at в tickets — UTC: сессия MySQL в UTC, кэш пишет utcnow()
+    if created_at is None:
+        return 0
+    return max(0, int((utcnow() - created_at).total_seconds()))
+
+
+def event_metrics(event: dict, data: dict):
+    kind = event["event"]
+    seconds = data.get("seconds", 0)
+
+    if kind == "created":
+        return 0, {"created": 1}
+    if kind == "claimed":
+        return event["actor_id"], {"claimed": 1, "claim_seconds": seconds}
+    if kind == "first_response":
+        return event["actor_id"], {"responded": 1, "response_seconds": seconds}
+    if kind == "closed":
+        # закрытие засчитывается тому, кто вёл тикет (или закрыл его сам)
+        return data.get("admin_id") or 0, {"closed": 1, "close_seconds": seconds}
+
+    return None
+
+
+class TicketStats:
+    # ================== ROLLUP ==================
+
+    @classmethod
+    async def rollup(cls) -> int:
+        processed = 0
+
+        while True:
+            count = await cls._rollup_batch()
+            processed += count
+
+            if count < ROLLUP_BATCH_SIZE:
+                return processed
+
+    @classmethod
+    async def _rollup_batch(cls) -> int:
+        # агрегаты и водяной знак меняются одной транзакцией — событие не учтётся дважды
+        async with Database.transaction() as tx:
+            state = await tx.fetchrow(
+                "SELECT last_event_id FROM ticket_stats_state WHERE name = %s FOR UPDATE",
+                (STATE_NAME,)
+            )
+            last_event_id = state["last_event_id"] if state else 0
+
+            # только новые события по первичному ключу — таблицу tickets не трогаем
+            events = await tx.fetchall(
+                """
+                SELECT id, event, actor_id, data, created_at FROM ticket_events
+                WHERE id > %s ORDER BY id LIMIT %s
+                """,
+                (last_event_id, ROLLUP_BATCH_SIZE)
+            )
+            if not events:
+                return 0
+
+            hourly = {}
+            daily = {}
+
+            for event in events:
+                data = json.loads(event["data"]) if event["data"] else {}
+
+                metrics = event_metrics(event, data)
+                if metrics is None:
+                    continue
+
+                admin_id, values = metrics
+                ticket_type = data.get("ticket_type") or "unknown"
+                hour = event["created_at"].replace(minute=0, second=0, microsecond=0)
+
+                for buckets, bucket in ((hourly, hour), (daily, hour.replace(hour=0))):
+                    row = buckets.setdefault(
+                        (bucket, ticket_type, admin_id),
+                        dict.fromkeys(METRICS, 0)
+                    )
+                    for metric, value in values.items():
+                        row[metric] += value
+
+            for table, buckets in ((HOURLY_TABLE, hourly), (DAILY_TABLE, daily)):
+                if buckets:
+                    await tx.executemany(
+                        UPSERT.format(table=table),
+                        [
+                            (*key, *(row[metric] for metric in METRICS))
+                            for key, row in buckets.items()
+                        ]
+                    )
+
+            await tx.execute(
+                """
+                INSERT INTO ticket_stats_state (name, last_event_id) VALUES (%s, %s)
+                ON DUPLICATE KEY UPDATE last_event_id = VALUES(last_event_id)
+                """,
+                (STATE_NAME, events[-1]["id"])
+            )
+
+            return len(events)
+
+    # ================== READ ==================
+
+    @classmethod
+    async def summary(
+        cls,
+        since: datetime,
+        ticket_type: str = None,
+        admin_id: int = None,
+        hourly: bool = False
+    ) -> list:
+        table = HOURLY_TABLE if hourly else DAILY_TABLE
+        conditions = ["bucket >= %s"]
+        args = [since]
+
+        if ticket_type:
+            conditions.append("ticket_type = %s")
+            args.append(ticket_type)
+        if admin_id:
+            conditions.append("admin_id = %s")
+            args.append(admin_id)
+
+        where = " AND ".join(conditions)
+        # SUM по целым колонкам MySQL отдаёт DECIMAL — приводим к целому в запросе
+        sums = ", ".join(f"CAST(SUM({metric}) AS SIGNED) AS {metric}" for metric in METRICS)
+
+        return await Database.fetchall(
+            f"""
+            SELECT admin_id, {sums} FROM {table}
+            WHERE {where}
+            GROUP BY admin_id
+            ORDER BY closed DESC, claimed DESC
+            """,
+            args
+        )
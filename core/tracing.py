@@ -0,0 +1,31 @@
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+# без зависимости от discord: этапы пишет и core.database, который нужен
+# миграциям (python -m core.database migrate) без установленного discord.py
+
+# этапы: ack — ответ на взаимодействие, db — запросы MySQL, db_wait — ожидание
+# соединения из пула, rest — прочие вызовы API Discord, log — постановка лога в очередь
+ACK = "ack"
+DB = "db"
+DB_WAIT = "db_wait"
+REST = "rest"
+LOG = "log"
+
+current_trace: ContextVar = ContextVar("interaction_trace", default=None)
+
+
+def record(stage: str, seconds: float):
+    current = current_trace.get()
+    if current is not None:
+        current.add(stage, seconds)
+
+
+@contextmanager
+def stage(name: str):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(name, time.perf_counter() - started)
@@ -0,0 +1,349 @@
+import asyncio
+import json
+import os
+
+import discord
+
+from config import TRANSCRIPTS_DIR
+from core.database import Database
+
+CAPTURE_DIR = os.path.join(TRANSCRIPTS_DIR, "capture")
+
+# сколько каналов догоняем параллельно после рестарта
+BACKFILL_CONCURRENCY = 4
+# попытки догнать канал, прежде чем писать живые события поверх пропуска
+BACKFILL_ATTEMPTS = 3
+BACKFILL_RETRY_DELAY = 5
+
+
+# ================== RECORDS ==================
+
+def embed_record(embed: dict) -> dict:
+    return {
+        "title": embed.get("title"),
+        "description": embed.get("description"),
+        "fields": [
+            {"name": field.get("name", ""), "value": field.get("value", "")}
+            for field in embed.get("fields", [])
+        ]
+    }
+
+
+def message_record(message) -> dict:
+    return {
+        "op": "create",
+        "id": message.id,
+        "author_id": message.author.id,
+        "author_name": str(message.author),
+        "avatar_url": message.author.display_avatar.url,
+        "created_at": message.created_at.isoformat(),
+        "content": message.content,
+        "attachments": [
+            {
+                "url": attachment.url,
+                "filename": attachment.filename,
+                "content_type": attachment.content_type
+            }
+            for attachment in message.attachments
+        ],
+        "embeds": [embed_record(embed.to_dict()) for embed in message.embeds]
+    }
+
+
+def edit_record(message_id: int, data: dict) -> dict:
+    record = {"op": "edit", "id": message_id}
+
+    # в raw-событии приходят только изменившиеся поля
+    if "content" in data:
+        record["content"] = data["content"]
+    if "embeds" in data:
+        record["embeds"] = [embed_record(embed) for embed in data["embeds"]]
+
+    return record
+
+
+def delete_record(message_id: int) -> dict:
+    return {"op": "delete", "id": message_id}
+
+
+# ================== CAPTURE ==================
+
+class TranscriptCapture:
+    channels: set = set()
+    loaded: bool = False
+
+    _synced: set = set()
+    _pending: dict = {}
+    _locks: dict = {}
+
+    @classmethod
+    def log_path(cls, channel_id: int) -> str:
+        return os.path.join(CAPTURE_DIR, f"{channel_id}.jsonl")
+
+    @classmethod
+    def is_tracked(cls, channel_id: int) -> bool:
+        return channel_id in cls.channels
+
+    @classmethod
+    def _lock(cls, channel_id: int) -> asyncio.Lock:
+        lock = cls._locks.get(channel_id)
+        if lock is None:
+            lock = cls._locks[channel_id] = asyncio.Lock()
+        return lock
+
+    @classmethod
+    async def load(cls, bot):
+        rows = await Database.fetchall(
+            """
+            SELECT channel_id FROM tickets
+            WHERE status IN ('open', 'closed') AND channel_id IS NOT NULL
+            """
+        )
+
+        # закрытые тикеты, чьи каналы уже удалены, не интересны
+        cls.channels = {
+            row["channel_id"] for row in rows
+            if bot.get_channel(row["channel_id"])
+        }
+        cls.loaded = True
+
+    @classmethod
+    def track(cls, channel_id: int):
+        # новый канал: догонять нечего, сразу пишем напрямую
+        cls.channels.add(channel_id)
+        cls._synced.add(channel_id)
+
+    @classmethod
+    async def untrack(cls, channel_id: int):
+        cls.channels.discard(channel_id)
+        cls._synced.discard(channel_id)
+        cls._pending.pop(channel_id, None)
+
+        async with cls._lock(channel_id):
+            await asyncio.to_thread(_remove_silent, cls.log_path(channel_id))
+
+        cls._locks.pop(channel_id, None)
+
+    @classmethod
+    async def append(cls, channel_id: int, record: dict):
+        if channel_id not in cls.channels:
+            return
+
+        # пока канал догоняется по истории, живые события ждут в очереди
+        if channel_id not in cls._synced:
+            cls._pending.setdefault(channel_id, []).append(record)
+            return
+
+        await cls._write(channel_id, [record])
+
+    @classmethod
+    async def _write(cls, channel_id: int, records: list):
+        if not records:
+            return
+
+        data = "".join(
+            json.dumps(record, ensure_ascii=False) + "\n"
+            for record in records
+        )
+
+        async with cls._lock(channel_id):
+            await asyncio.to_thread(_append_text, cls.log_path(channel_id), data)
+
+    # ================== BACKFILL ==================
+
+    @classmethod
+    async def resync(cls, bot):
+        if not cls.loaded:
+            await cls.load(bot)
+
+        # после (пере)подключения события могли потеряться — догоняем все каналы
+        cls._synced.clear()
+
+        semaphore = asyncio.Semaphore(BACKFILL_CONCURRENCY)
+
+        async def run(channel_id: int):
+            channel = bot.get_channel(channel_id)
+            if channel is None:
+                await cls.untrack(channel_id)
+                return
+
+            for attempt in range(1, BACKFILL_ATTEMPTS + 1):
+                try:
+                    async with semaphore:
+                        await cls.backfill(channel)
+                    return
+                except Exception as e:
+                    print(f"⚠️ Backfill of channel {channel_id} failed ({attempt}/{BACKFILL_ATTEMPTS}): {e!r}")
+
+                if attempt < BACKFILL_ATTEMPTS:
+                    await asyncio.sleep(BACKFILL_RETRY_DELAY * attempt)
+
+            # историю не догнали — дальше пишем напрямую, иначе очередь растёт без предела
+            await cls._flush_pending(channel_id)
+            cls._synced.add(channel_id)
+
+        await asyncio.gather(*(run(channel_id) for channel_id in list(cls.channels)))
+
+    @classmethod
+    async def ensure_synced(cls, channel):
+        cls.channels.add(channel.id)
+
+        if channel.id not in cls._synced:
+            await cls.backfill(channel)
+
+    @classmethod
+    async def backfill(cls, channel, batch_size: int = 100):
+        async with cls._lock(channel.id):
+            last_id = await asyncio.to_thread(
+                _last_message_id, cls.log_path(channel.id)
+            )
+
+        after = discord.Object(id=last_id) if last_id else None
+        batch = []
+
+        async for message in channel.history(
+            limit=None,
+            after=after,
+            oldest_first=True
+        ):
+            batch.append(message_record(message))
+
+            if len(batch) >= batch_size:
+                await cls._write(channel.id, batch)
+                batch = []
+
+        await cls._write(channel.id, batch)
+
+        # то, что пришло во время догонки, пишем следом; дубли отсекаются при чтении.
+        # при сбое очередь не трогаем: повтор продолжит с последнего сообщения истории
+        await cls._flush_pending(channel.id)
+        cls._synced.add(channel.id)
+
+    @classmethod
+    async def _flush_pending(cls, channel_id: int):
+        while cls._pending.get(channel_id):
+            await cls._write(channel_id, cls._pending.pop(channel_id))
+
+    # ================== READ ==================
+
+    @classmethod
+    async def iter_records(cls, channel_id: int, batch_size: int = 500):
+        path = cls.log_path(channel_id)
+
+        if not await asyncio.to_thread(os.path.isfile, path):
+            return
+
+        async with cls._lock(channel_id):
+            edits, deleted = await asyncio.to_thread(_scan_changes, path)
+            # читаем только то, что было записано к этому моменту
+            size = await asyncio.to_thread(os.path.getsize, path)
+
+        seen = set()
+        consumed = 0
+        file = await asyncio.to_thread(open, path, "rb")
+
+        try:
+            while consumed < size:
+                lines = await asyncio.to_thread(file.readlines, 1 << 20)
+                if not lines:
+                    break
+
+                batch = []
+
+                for line in lines:
+                    consumed += len(line)
+                    if consumed > size:
+                        break
+
+                    record = json.loads(line)
+
+                    if record["op"] != "create" or record["id"] in seen:
+                        continue
+
+                    seen.add(record["id"])
+                    record.update(edits.get(record["id"], {}))
+                    record["deleted"] = record["id"] in deleted
+                    batch.append(record)
+
+                    if len(batch) >= batch_size:
+                        yield batch
+                        batch = []
+
+                if batch:
+                    yield batch
+        finally:
+            await asyncio.to_thread(file.close)
+
+
+# ================== FILE HELPERS ==================
+
+def _append_text(path: str, data: str):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    with open(path, "a", encoding="utf-8") as f:
+        f.write(data)
+
+
+def _remove_silent(path: str):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def _scan_changes(path: str):
+    edits = {}
+    deleted = set()
+
+    if not os.path.isfile(path):
+        return edits, deleted
+
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            # create-записи не разбираем: правок и удалений обычно единицы
+            if '"op": "create"' in line[:20]:
+                continue
+
+            record = json.loads(line)
+
+            if record["op"] == "edit":
+                changes = edits.setdefault(record["id"], {})
+                changes.update(
+                    {key: value for key, value in record.items() if key not in ("op", "id")}
+                )
+                changes["edited"] = True
+            elif record["op"] == "delete":
+                deleted.add(record["id"])
+
+    return edits, deleted
+
+
+def _last_message_id(path: str, block_size: int = 65536):
+    if not os.path.isfile(path):
+        return None
+
+    with open(path, "rb") as f:
+        f.seek(0, os.SEEK_END)
+        position = f.tell()
+        tail = b""
+
+        # читаем файл с конца блоками, пока не найдём последний create
+        while position > 0:
+            step = min(block_size, position)
+            position -= step
+            f.seek(position)
+            tail = f.read(step) + tail
+
+            lines = tail.split(b"\n")
+            tail = lines[0] if position > 0 else b""
+            complete = lines[1:] if position > 0 else lines
+
+            for line in reversed(complete):
+                if not line.strip():
+                    continue
+
+                record = json.loads(line)
+                if record["op"] == "create":
+                    return record["id"]
+
+    return None
@@ -0,0 +1,105 @@
+import asyncio
+import json
+import sys
+from collections import OrderedDict
+
+from core.transcript_store import shard_path
+
+PAGE_SIZE = 100
+MAX_PAGE_SIZE = 500
+
+# индексы авторов и участники небольших транскриптов — держим последние в памяти
+META_CACHE_SIZE = 64
+
+OFFSET_SIZE = 8
+
+
+class TranscriptPages:
+    _meta: OrderedDict = OrderedDict()
+
+    @classmethod
+    async def meta(cls, digest: str) -> dict:
+        meta = cls._meta.get(digest)
+
+        if meta is None:
+            meta = await asyncio.to_thread(_read_meta, digest)
+
+            cls._meta[digest] = meta
+            while len(cls._meta) > META_CACHE_SIZE:
+                cls._meta.popitem(last=False)
+        else:
+            cls._meta.move_to_end(digest)
+
+        return meta
+
+    @classmethod
+    async def page(cls, digest: str, offset: int, limit: int, author: str = None) -> dict:
+        meta = await cls.meta(digest)
+        limit = max(1, min(limit, MAX_PAGE_SIZE))
+        offset = max(0, offset)
+
+        if author:
+            # offset — позиция в выборке автора, не во всём транскрипте
+            positions = meta["authors"].get(author, [])
+            total = len(positions)
+            selected = positions[offset:offset + limit]
+        else:
+            total = meta["messages"]
+            selected = range(offset, min(offset + limit, total))
+
+        messages = await asyncio.to_thread(_read_records, digest, selected)
+        end = offset + len(messages)
+
+        return {
+            "total": total,
+            "offset": offset,
+            "next": end if end < total else None,
+            "messages": messages,
+        }
+
+
+# ================== FILE HELPERS ==================
+
+def _read_meta(digest: str) -> dict:
+    with open(shard_path(digest, ".meta.json"), "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _runs(positions) -> list:
+    # подряд идущие номера читаем одним куском
+    runs = []
+
+    for position in positions:
+        if runs and runs[-1][1] == position:
+            runs[-1][1] = position + 1
+        else:
+            runs.append([position, position + 1])
+
+    return runs
+
+
+def _read_offset(index, position: int) -> int:
+    index.seek(position * OFFSET_SIZE)
+    # индекс пишется array("Q").tofile — в порядке байт этой машины
+    return int.from_bytes(index.read(OFFSET_SIZE), sys.byteorder)
+
+
+def _read_records(digest: str, positions) -> list:
+    records = []
+
+    if not positions:
+        return records
+
+    # из индекса читаем только границы нужных диапазонов, из данных — только их байты
+    with open(shard_path(digest, ".idx"), "rb") as index, \
+            open(shard_path(digest, ".ndjson"), "rb") as data:
+        for first, last in _runs(positions):
+            start = _read_offset(index, first)
+            end = _read_offset(index, last)
+
+            data.seek(start)
+            chunk = data.read(end - start)
+
+            records.extend(json.loads(line) for line in chunk.splitlines())
+
+    return records
@@ -1,28 +1,379 @@
+import asyncio
+import gzip
+import hashlib
+import mimetypes
 import os
+import re
+import stat as stat_module
 from aiohttp import web
 
-TRANSCRIPTS_DIR = "transcripts"
+from config import METRICS_HOST, METRICS_PORT, TRANSCRIPTS_DIR
+from core.attachment_mirror import ATTACHMENT_NAME_RE, attachment_path
+from core.instrumentation import InteractionMetrics
+from core.transcript_store import DIGEST_RE, TranscriptStore, shard_path
+from core.transcript_pages import PAGE_SIZE, TranscriptPages
+from utils.formatting import (
+    TRANSCRIPT_CSS,
+    TRANSCRIPT_CSS_VERSION,
+    VIEWER_JS,
+    VIEWER_JS_VERSION,
+    render_viewer_page
+)
+
+# транскрипт после записи не меняется
+CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+# в порядке предпочтения
+PRECOMPRESSED = (
+    ("br", ".br"),
+    ("gzip", ".gz"),
+)
+
+# старые ссылки: только <channel-name>.html прямо в TRANSCRIPTS_DIR
+LEGACY_NAME_RE = re.compile(r"\w[\w.-]*\.html")
+
+# общие stylesheet и скрипт просмотрщика: версия в имени файла, содержимое в памяти
+STATIC_NAME_RE = re.compile(r"([a-z]+)\.([0-9a-f]{12})\.(css|js)")
+STATIC_ASSETS = {
+    "transcript.css": (TRANSCRIPT_CSS, TRANSCRIPT_CSS_VERSION, "text/css; charset=utf-8"),
+    "viewer.js": (VIEWER_JS, VIEWER_JS_VERSION, "text/javascript; charset=utf-8"),
+}
+STATIC_GZIP = {
+    name: gzip.compress(body, compresslevel=9, mtime=0)
+    for name, (body, _, _) in STATIC_ASSETS.items()
+}
+
+# (path, mtime_ns, size) -> ETag
+_etags: dict = {}
+ETAG_CACHE_SIZE = 10000
+
+
+def _file_digest(path: str) -> str:
+    sha256 = hashlib.sha256()
+
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            sha256.update(block)
+
+    return sha256.hexdigest()
+
+
+async def get_etag(path: str, stat: os.stat_result) -> str:
+    key = (path, stat.st_mtime_ns, stat.st_size)
+
+    etag = _etags.get(key)
+    if etag is None:
+        digest = await asyncio.to_thread(_file_digest, path)
+
+        if len(_etags) >= ETAG_CACHE_SIZE:
+            _etags.clear()
+        etag = _etags[key] = f'"{digest[:32]}"'
+
+    return etag
+
+
+def accepted_encodings(header: str) -> set:
+    encodings = set()
+
+    for part in header.split(","):
+        name, _, params = part.strip().partition(";")
+        name = name.strip().lower()
+        if not name:
+            continue
+
+        quality = 1.0
+        for param in params.split(";"):
+            key, _, value = param.strip().partition("=")
+            if key == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+
+        if quality > 0:
+            encodings.add(name)
+
+    return encodings
+
+
+def etag_matches(header: str, etag: str) -> bool:
+    if not header:
+        return False
+
+    if header.strip() == "*":
+        return True
+
+    # слабое сравнение, как того требует If-None-Match
+    candidates = {tag.strip().removeprefix("W/") for tag in header.split(",")}
+    return etag in candidates
+
+
+def _stat_file(path: str):
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+
+    return stat if stat_module.S_ISREG(stat.st_mode) else None
+
+
+class ContentFileResponse(web.FileResponse):
+    # FileResponse.prepare ставит свой ETag (mtime-размер) поверх переданного;
+    # ETag из заголовков — хэш содержимого, его и оставляем
+    @property
+    def etag(self):
+        return web.FileResponse.etag.fget(self)
+
+    @etag.setter
+    def etag(self, value):
+        if "ETag" not in self.headers:
+            web.FileResponse.etag.fset(self, value)
+
+
+def _not_modified(request: web.Request, headers: dict, etag: str):
+    headers["ETag"] = etag
+
+    if not etag_matches(request.headers.get("If-None-Match"), etag):
+        return None
+
+    headers.pop("Content-Type", None)
+    headers.pop("Content-Encoding", None)
+    return web.Response(status=304, headers=headers)
+
+
+async def serve_stored(request: web.Request, entry: dict):
+    digest = entry["digest"]
+    headers = {
+        "Cache-Control": CACHE_CONTROL,
+        "Vary": "Accept-Encoding",
+        "Content-Type": "text/html; charset=utf-8",
+    }
+
+    # ETag = хэш содержимого, считать ничего не нужно
+    if entry.get("archive"):
+        response = _not_modified(request, headers, f'"{digest[:32]}"')
+        if response:
+            return response
+
+        body = await TranscriptStore.read_archived(entry)
+        return web.Response(body=body, headers=headers)
+
+    accepted = accepted_encodings(request.headers.get("Accept-Encoding", ""))
+    path = shard_path(digest)
+    etag = f'"{digest[:32]}"'
+
+    for encoding, suffix in PRECOMPRESSED:
+        if encoding in accepted and encoding in entry["encodings"]:
+            path += suffix
+            etag = f'"{digest[:32]}-{encoding}"'
+            headers["Content-Encoding"] = encoding
+            break
+
+    response = _not_modified(request, headers, etag)
+    if response:
+        return response
+
+    return ContentFileResponse(path, headers=headers)
 
 
 async def handle_transcripts(request: web.Request):
-    filename = request.match_info.get("filename")
+    filename = request.match_info.get("filename") or ""
 
-    if not filename:
+    # новые транскрипты: <sha256>.html, поиск по индексу без обращения к диску
+    name, extension = os.path.splitext(filename)
+    if extension == ".html" and DIGEST_RE.fullmatch(name):
+        entry = TranscriptStore.lookup(name)
+        if entry is None:
+            return web.Response(status=404)
+        return await serve_stored(request, entry)
+
+    # старые ссылки вида <channel-name>.html; служебные файлы каталога не отдаём
+    if not LEGACY_NAME_RE.fullmatch(filename):
         return web.Response(status=404)
 
     filepath = os.path.join(TRANSCRIPTS_DIR, filename)
 
-    if not os.path.isfile(filepath):
+    stat = await asyncio.to_thread(_stat_file, filepath)
+    if stat is None:
+        return web.Response(status=404)
+
+    content_type, _ = mimetypes.guess_type(filename)
+    headers = {
+        "Cache-Control": CACHE_CONTROL,
+        "Vary": "Accept-Encoding",
+        "Content-Type": f"{content_type or 'application/octet-stream'}; charset=utf-8",
+    }
+
+    # готовые .br / .gz рядом с файлом, если клиент их принимает
+    accepted = accepted_encodings(request.headers.get("Accept-Encoding", ""))
+    path = filepath
+
+    for encoding, suffix in PRECOMPRESSED:
+        if encoding not in accepted:
+            continue
+
+        variant_stat = await asyncio.to_thread(_stat_file, filepath + suffix)
+        if variant_stat is not None:
+            path, stat = filepath + suffix, variant_stat
+            headers["Content-Encoding"] = encoding
+            break
+
+    response = _not_modified(request, headers, await get_etag(path, stat))
+    if response:
+        return response
+
+    # Range / If-Range обрабатывает сам FileResponse
+    return ContentFileResponse(path, headers=headers)
+
+
+async def handle_static(request: web.Request):
+    match = STATIC_NAME_RE.fullmatch(request.match_info.get("filename", ""))
+    if not match:
+        return web.Response(status=404)
+
+    name = f"{match.group(1)}.{match.group(3)}"
+    asset = STATIC_ASSETS.get(name)
+    if asset is None:
+        return web.Response(status=404)
+
+    body, version, content_type = asset
+
+    headers = {
+        # старая версия: отдаём текущую, но без долгого кэша
+        "Cache-Control": CACHE_CONTROL if match.group(2) == version else "no-cache",
+        "Vary": "Accept-Encoding",
+        "Content-Type": content_type,
+    }
+
+    if "gzip" in accepted_encodings(request.headers.get("Accept-Encoding", "")):
+        headers["Content-Encoding"] = "gzip"
+        body = STATIC_GZIP[name]
+        etag = f'"{version}-gzip"'
+    else:
+        etag = f'"{version}"'
+
+    response = _not_modified(request, headers, etag)
+    if response:
+        return response
+
+    return web.Response(body=body, headers=headers)
+
+
+# ================== PAGED VIEWER ==================
+
+def _paged_entry(request: web.Request):
+    digest = request.match_info.get("digest", "")
+    if not DIGEST_RE.fullmatch(digest):
+        return None
+
+    entry = TranscriptStore.lookup(digest)
+    if entry is None or not entry.get("paged"):
+        return None
+
+    return entry
+
+
+async def handle_viewer(request: web.Request):
+    entry = _paged_entry(request)
+    if entry is None:
+        return web.Response(status=404)
+
+    return web.Response(
+        text=render_viewer_page(entry["digest"], entry["channel"]),
+        content_type="text/html",
+        headers={"Cache-Control": CACHE_CONTROL}
+    )
+
+
+async def handle_page_meta(request: web.Request):
+    entry = _paged_entry(request)
+    if entry is None:
+        return web.Response(status=404)
+
+    meta = await TranscriptPages.meta(entry["digest"])
+
+    return web.json_response(
+        {
+            "channel": meta["channel"],
+            "messages": meta["messages"],
+            "participants": meta["participants"],
+        },
+        headers={"Cache-Control": CACHE_CONTROL}
+    )
+
+
+async def handle_page(request: web.Request):
+    entry = _paged_entry(request)
+    if entry is None:
+        return web.Response(status=404)
+
+    try:
+        offset = int(request.query.get("offset", 0))
+        limit = int(request.query.get("limit", PAGE_SIZE))
+    except ValueError:
+        return web.Response(status=400)
+
+    author = request.query.get("author")
+    if author and not author.isdigit():
+        return web.Response(status=400)
+
+    page = await TranscriptPages.page(entry["digest"], offset, limit, author)
+
+    # транскрипт неизменяем — любая страница тоже
+    return web.json_response(page, headers={"Cache-Control": CACHE_CONTROL})
+
+
+async def handle_attachments(request: web.Request):
+    filename = request.match_info.get("filename")
+
+    # только имена из хранилища: <sha256>.<ext>, никаких путей
+    match = ATTACHMENT_NAME_RE.fullmatch(filename or "")
+    if not match:
+        return web.Response(status=404)
+
+    path = attachment_path(filename)
+
+    stat = await asyncio.to_thread(_stat_file, path)
+    if stat is None:
         return web.Response(status=404)
 
-    return web.FileResponse(filepath)
+    content_type, _ = mimetypes.guess_type(filename)
+    headers = {
+        "Cache-Control": CACHE_CONTROL,
+        "Content-Type": content_type or "application/octet-stream",
+        # вложения пользователей не должны исполняться в контексте сервера
+        "X-Content-Type-Options": "nosniff",
+        "Content-Security-Policy": "sandbox",
+    }
+
+    response = _not_modified(request, headers, f'"{match.group(1)[:32]}"')
+    if response:
+        return response
+
+    return ContentFileResponse(path, headers=headers)
+
+
+async def handle_metrics(request: web.Request):
+    return web.Response(
+        body=InteractionMetrics.render().encode(),
+        headers={
+            "Content-Type": "text/plain; version=0.0.4; charset=utf-8",
+            "Cache-Control": "no-store",
+        }
+    )
 
 
 async def start_transcript_server(host: str, port: int):
     os.makedirs(TRANSCRIPTS_DIR, exist_ok=True)
+    await TranscriptStore.load()
 
     app = web.Application()
     app.router.add_get("/transcripts/{filename}", handle_transcripts)
+    app.router.add_get("/static/{filename}", handle_static)
+    app.router.add_get("/attachments/{filename}", handle_attachments)
+    app.router.add_get("/view/{digest}", handle_viewer)
+    app.router.add_get("/api/transcripts/{digest}/meta", handle_page_meta)
+    app.router.add_get("/api/transcripts/{digest}/messages", handle_page)
 
     runner = web.AppRunner(app)
     await runner.setup()
@@ -31,3 +382,20 @@ async def start_transcript_server(host: str, port: int):
     await site.start()
 
     print(f"🌐 Transcript server running on http://{host}:{port}")
+
+    if METRICS_PORT:
+        await start_metrics_server(METRICS_HOST, METRICS_PORT)
+
+
+async def start_metrics_server(host: str, port: int):
+    # метрики не делят порт с публичным сервером транскриптов
+    app = web.Application()
+    app.router.add_get("/metrics", handle_metrics)
+
+    runner = web.AppRunner(app)
+    await runner.setup()
+
+    site = web.TCPSite(runner, host, port)
+    await site.start()
+
+    print(f"📈 Metrics server running on http://{host}:{port}/metrics")
@@ -0,0 +1,261 @@
+import asyncio
+import json
+import os
+import re
+import uuid
+import zipfile
+from datetime import datetime, timedelta, timezone
+
+from config import TRANSCRIPTS_DIR
+from core.transcript_writer import DATA_SUFFIXES, precompress
+
+STORE_DIR = os.path.join(TRANSCRIPTS_DIR, "store")
+TMP_DIR = os.path.join(STORE_DIR, "tmp")
+ARCHIVE_DIR = os.path.join(TRANSCRIPTS_DIR, "archive")
+# манифест — список всех дайджестов: лежит в STORE_DIR, который сервер не отдаёт
+MANIFEST_PATH = os.path.join(STORE_DIR, "manifest.jsonl")
+LEGACY_MANIFEST_PATH = os.path.join(TRANSCRIPTS_DIR, "manifest.jsonl")
+
+DIGEST_RE = re.compile(r"[0-9a-f]{64}")
+VARIANT_SUFFIXES = ("", ".gz", ".br")
+
+
+def shard_path(digest: str, suffix: str = ".html") -> str:
+    # transcripts/store/ab/cd/abcd....html — в одном каталоге не больше пары сотен файлов
+    return os.path.join(STORE_DIR, digest[:2], digest[2:4], f"{digest}{suffix}")
+
+
+class TranscriptStore:
+    by_digest: dict = {}
+    by_ticket: dict = {}
+
+    _lock = asyncio.Lock()
+
+    @classmethod
+    async def load(cls):
+        entries = await asyncio.to_thread(_read_manifest)
+
+        cls.by_digest = {}
+        cls.by_ticket = {}
+
+        for entry in entries:
+            cls._index(entry)
+
+        # недописанные транскрипты прошлого запуска
+        await asyncio.to_thread(_clear_dir, TMP_DIR)
+
+        print(f"✅ Transcript store loaded ({len(cls.by_digest)} transcripts)")
+
+    @classmethod
+    def _index(cls, entry: dict):
+        cls.by_digest[entry["digest"]] = entry
+
+        ticket_id = entry.get("ticket_id")
+        if ticket_id is None:
+            return
+
+        current = cls.by_digest.get(cls.by_ticket.get(ticket_id))
+        if current is None or current["created_at"] <= entry["created_at"]:
+            cls.by_ticket[ticket_id] = entry["digest"]
+
+    # ================== LOOKUP ==================
+
+    @classmethod
+    def lookup(cls, digest: str):
+        return cls.by_digest.get(digest)
+
+    @classmethod
+    def latest_for_ticket(cls, ticket_id: int):
+        return cls.by_digest.get(cls.by_ticket.get(ticket_id))
+
+    @classmethod
+    async def read_archived(cls, entry: dict) -> bytes:
+        return await asyncio.to_thread(
+            _read_member, os.path.join(ARCHIVE_DIR, entry["archive"]), f"{entry['digest']}.html"
+        )
+
+    # ================== WRITE ==================
+
+    @classmethod
+    def temp_path(cls) -> str:
+        return os.path.join(TMP_DIR, f"{uuid.uuid4().hex}.html")
+
+    @classmethod
+    async def put(
+        cls,
+        tmp_path: str,
+        digest: str,
+        *,
+        ticket_id: int = None,
+        channel_name: str,
+        size: int,
+        messages: int,
+        data_path: str = None
+    ) -> dict:
+        existing = cls.by_digest.get(digest)
+
+        if existing and not existing.get("archive"):
+            # тот же контент уже лежит в хранилище
+            await asyncio.to_thread(_remove_silent, tmp_path)
+            encodings = existing["encodings"]
+        else:
+            encodings = await asyncio.to_thread(_commit_file, tmp_path, shard_path(digest))
+
+        # постраничные данные детерминированы содержимым — тот же дайджест, те же файлы
+        if data_path:
+            await asyncio.to_thread(_commit_data, data_path, digest)
+
+        entry = {
+            "digest": digest,
+            "ticket_id": ticket_id,
+            "channel": channel_name,
+            "size": size,
+            "messages": messages,
+            "created_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "encodings": encodings,
+            "archive": None,
+            "paged": bool(data_path),
+        }
+
+        async with cls._lock:
+            await asyncio.to_thread(_append_manifest, entry)
+            cls._index(entry)
+
+        return entry
+
+    # ================== RETENTION ==================
+
+    @classmethod
+    async def compact(cls, older_than_days: int) -> int:
+        cutoff = (
+            datetime.now(timezone.utc) - timedelta(days=older_than_days)
+        ).isoformat(timespec="seconds")
+
+        async with cls._lock:
+            candidates = [
+                entry for entry in cls.by_digest.values()
+                if not entry.get("archive") and entry["created_at"] < cutoff
+            ]
+
+            archived = await asyncio.to_thread(_archive_entries, candidates)
+
+            for digest, bundle in archived.items():
+                cls.by_digest[digest]["archive"] = bundle
+                cls.by_digest[digest]["encodings"] = []
+
+            # заодно схлопываем манифест: одна строка на транскрипт
+            await asyncio.to_thread(_rewrite_manifest, list(cls.by_digest.values()))
+
+        # файлы удаляем только после того, как манифест указывает на архив
+        await asyncio.to_thread(_remove_stored, list(archived))
+
+        return len(archived)
+
+
+# ================== FILE HELPERS ==================
+
+def _remove_silent(path: str):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def _clear_dir(path: str):
+    if not os.path.isdir(path):
+        return
+
+    for name in os.listdir(path):
+        _remove_silent(os.path.join(path, name))
+
+
+def _commit_file(tmp_path: str, target: str) -> list:
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    os.replace(tmp_path, target)
+    return precompress(target)
+
+
+def _commit_data(data_path: str, digest: str):
+    for suffix in DATA_SUFFIXES:
+        os.replace(data_path + suffix, shard_path(digest, suffix))
+
+
+def _read_manifest() -> list:
+    # манифест со старого места переносим один раз
+    if os.path.isfile(LEGACY_MANIFEST_PATH) and not os.path.isfile(MANIFEST_PATH):
+        os.makedirs(STORE_DIR, exist_ok=True)
+        os.replace(LEGACY_MANIFEST_PATH, MANIFEST_PATH)
+
+    if not os.path.isfile(MANIFEST_PATH):
+        return []
+
+    entries = []
+
+    with open(MANIFEST_PATH, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                entries.append(json.loads(line))
+
+    return entries
+
+
+def _append_manifest(entry: dict):
+    os.makedirs(os.path.dirname(MANIFEST_PATH) or ".", exist_ok=True)
+
+    with open(MANIFEST_PATH, "a", encoding="utf-8") as f:
+        f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+
+
+def _rewrite_manifest(entries: list):
+    tmp_path = f"{MANIFEST_PATH}.part"
+
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        for entry in entries:
+            f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+
+    os.replace(tmp_path, MANIFEST_PATH)
+
+
+def _archive_entries(entries: list) -> dict:
+    archived = {}
+    by_month = {}
+
+    for entry in entries:
+        by_month.setdefault(entry["created_at"][:7], []).append(entry)
+
+    os.makedirs(ARCHIVE_DIR, exist_ok=True)
+
+    # один zip на месяц: в отличие от tar.gz читается по одному файлу
+    for month, month_entries in by_month.items():
+        bundle = f"{month}.zip"
+
+        with zipfile.ZipFile(
+            os.path.join(ARCHIVE_DIR, bundle), "a",
+            compression=zipfile.ZIP_DEFLATED, compresslevel=9
+        ) as zf:
+            names = set(zf.namelist())
+
+            for entry in month_entries:
+                digest = entry["digest"]
+                path = shard_path(digest)
+
+                if f"{digest}.html" not in names:
+                    if not os.path.isfile(path):
+                        continue
+                    zf.write(path, arcname=f"{digest}.html")
+
+                archived[digest] = bundle
+
+    return archived
+
+
+def _remove_stored(digests: list):
+    for digest in digests:
+        for suffix in VARIANT_SUFFIXES:
+            _remove_silent(shard_path(digest) + suffix)
+
+
+def _read_member(bundle_path: str, name: str) -> bytes:
+    with zipfile.ZipFile(bundle_path) as zf:
+        return zf.read(name)
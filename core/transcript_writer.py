@@ -0,0 +1,271 @@
+import asyncio
+import gzip
+import hashlib
+import json
+import multiprocessing
+import os
+import shutil
+from array import array
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from config import (
+    TRANSCRIPT_CHUNK_SIZE,
+    TRANSCRIPT_RENDER_EXECUTOR,
+    TRANSCRIPT_RENDER_WORKERS
+)
+from utils.formatting import render_batch
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESS_BLOCK_SIZE = 1 << 20
+
+# <base>.ndjson — по сообщению на строку, <base>.idx — смещения строк (uint64),
+# <base>.meta.json — участники и номера сообщений каждого автора
+DATA_SUFFIXES = (".ndjson", ".idx", ".meta.json")
+
+# в постраничный формат не попадают служебные поля и аватар (он в участниках)
+DATA_SKIP_FIELDS = ("op", "avatar_url")
+
+
+class TranscriptWriter:
+    def __init__(self, path: str, chunk_size: int = TRANSCRIPT_CHUNK_SIZE):
+        self.path = path
+        self.tmp_path = f"{path}.part"
+        self.chunk_size = chunk_size
+
+        self.messages = 0
+        self.bytes_written = 0
+        self.sha256 = hashlib.sha256()
+
+        self._file = None
+        self._buffer = []
+        self._buffered = 0
+
+    async def open(self):
+        directory = os.path.dirname(self.path)
+        if directory:
+            await asyncio.to_thread(os.makedirs, directory, exist_ok=True)
+
+        self._file = await asyncio.to_thread(open, self.tmp_path, "wb")
+
+    async def write(self, text: str):
+        self._buffer.append(text)
+        self._buffered += len(text)
+
+        if self._buffered >= self.chunk_size:
+            await self.flush()
+
+    async def write_messages(self, html: str, count: int):
+        self.messages += count
+        await self.write(html)
+
+    async def flush(self):
+        if not self._buffer:
+            return
+
+        data = "".join(self._buffer).encode("utf-8")
+        self._buffer.clear()
+        self._buffered = 0
+
+        self.sha256.update(data)
+
+        # запись на диск — только в отдельном потоке, луп не блокируем
+        await asyncio.to_thread(self._file.write, data)
+        self.bytes_written += len(data)
+
+    async def close(self, commit: bool = True):
+        if self._file is None:
+            return
+
+        try:
+            if commit:
+                await self.flush()
+        finally:
+            await asyncio.to_thread(self._file.close)
+            self._file = None
+
+        if commit:
+            # файл появляется под итоговым именем только целиком
+            await asyncio.to_thread(os.replace, self.tmp_path, self.path)
+        else:
+            self._buffer.clear()
+            await asyncio.to_thread(_remove_silent, self.tmp_path)
+
+    async def __aenter__(self):
+        await self.open()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close(commit=exc_type is None)
+
+
+class TranscriptDataWriter:
+    # тот же транскрипт в формате для постраничного чтения: страница
+    # читается seek'ом по индексу, без разбора всего файла
+    def __init__(self, base_path: str, chunk_size: int = TRANSCRIPT_CHUNK_SIZE):
+        self.base_path = base_path
+        self.chunk_size = chunk_size
+
+        self.offsets = array("Q", [0])
+        self.authors = {}
+
+        self._file = None
+        self._buffer = []
+        self._buffered = 0
+
+    @property
+    def messages(self) -> int:
+        return len(self.offsets) - 1
+
+    async def open(self):
+        directory = os.path.dirname(self.base_path)
+        if directory:
+            await asyncio.to_thread(os.makedirs, directory, exist_ok=True)
+
+        self._file = await asyncio.to_thread(open, f"{self.base_path}.ndjson", "wb")
+
+    async def write_records(self, records: list):
+        lines = await asyncio.to_thread(_encode_records, records)
+
+        for record, line in zip(records, lines):
+            self.authors.setdefault(str(record["author_id"]), []).append(self.messages)
+            self.offsets.append(self.offsets[-1] + len(line))
+
+            self._buffer.append(line)
+            self._buffered += len(line)
+
+        if self._buffered >= self.chunk_size:
+            await self.flush()
+
+    async def flush(self):
+        if not self._buffer:
+            return
+
+        data = b"".join(self._buffer)
+        self._buffer.clear()
+        self._buffered = 0
+
+        await asyncio.to_thread(self._file.write, data)
+
+    async def close(self, meta: dict = None):
+        # meta=None — генерация упала, файлы не нужны
+        if self._file is None:
+            return
+
+        try:
+            if meta is not None:
+                await self.flush()
+        finally:
+            await asyncio.to_thread(self._file.close)
+            self._file = None
+
+        if meta is None:
+            for suffix in DATA_SUFFIXES:
+                await asyncio.to_thread(_remove_silent, self.base_path + suffix)
+            return
+
+        meta = dict(meta, messages=self.messages, authors=self.authors)
+        await asyncio.to_thread(_write_data_index, self.base_path, self.offsets, meta)
+
+
+def _encode_records(records: list) -> list:
+    return [
+        (json.dumps(
+            {key: value for key, value in record.items() if key not in DATA_SKIP_FIELDS},
+            ensure_ascii=False,
+            separators=(",", ":")
+        ) + "\n").encode("utf-8")
+        for record in records
+    ]
+
+
+def _write_data_index(base_path: str, offsets: array, meta: dict):
+    with open(f"{base_path}.idx", "wb") as f:
+        offsets.tofile(f)
+
+    with open(f"{base_path}.meta.json", "w", encoding="utf-8") as f:
+        json.dump(meta, f, ensure_ascii=False, separators=(",", ":"))
+
+
+def _remove_silent(path: str):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+# ================== RENDER POOL ==================
+
+_render_executor = None
+
+
+def get_render_executor():
+    global _render_executor
+
+    if _render_executor is None:
+        if TRANSCRIPT_RENDER_EXECUTOR == "process":
+            # spawn: форк процесса с живым event loop и потоками discord.py небезопасен
+            _render_executor = ProcessPoolExecutor(
+                max_workers=TRANSCRIPT_RENDER_WORKERS,
+                mp_context=multiprocessing.get_context("spawn")
+            )
+        elif TRANSCRIPT_RENDER_EXECUTOR == "thread":
+            _render_executor = ThreadPoolExecutor(
+                max_workers=TRANSCRIPT_RENDER_WORKERS,
+                thread_name_prefix="transcript-render"
+            )
+
+    return _render_executor
+
+
+async def render_records(records: list) -> str:
+    executor = get_render_executor()
+
+    if executor is None:
+        return render_batch(records)
+
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(executor, render_batch, records)
+
+
+def shutdown_render_executor():
+    global _render_executor
+
+    if _render_executor is not None:
+        _render_executor.shutdown(wait=False, cancel_futures=True)
+        _render_executor = None
+
+
+# ================== PRECOMPRESSION ==================
+
+def _compress_to(source: str, target: str, compressor):
+    tmp_path = f"{target}.part"
+
+    with open(source, "rb") as src, open(tmp_path, "wb") as dst:
+        while True:
+            block = src.read(COMPRESS_BLOCK_SIZE)
+            if not block:
+                break
+            dst.write(compressor.process(block))
+        dst.write(compressor.finish())
+
+    os.replace(tmp_path, target)
+
+
+def precompress(path: str) -> list:
+    # транскрипт после записи не меняется — сжимаем один раз, сервер отдаёт готовое
+    with open(path, "rb") as src, open(f"{path}.gz.part", "wb") as raw:
+        with gzip.GzipFile(fileobj=raw, mode="wb", compresslevel=9, mtime=0) as dst:
+            shutil.copyfileobj(src, dst, COMPRESS_BLOCK_SIZE)
+    os.replace(f"{path}.gz.part", f"{path}.gz")
+
+    encodings = ["gzip"]
+
+    if brotli is not None:
+        _compress_to(path, f"{path}.br", brotli.Compressor(quality=9))
+        encodings.append("br")
+
+    return encodings
@@ -0,0 +1,57 @@
+import asyncio
+
+import discord
+
+WEBHOOK_NAME = "TicketSupport"
+
+
+class WebhookRegistry:
+    # channel_id -> discord.Webhook, живёт столько же, сколько канал тикета
+    webhooks: dict = {}
+    _locks: dict = {}
+
+    @classmethod
+    def _lock(cls, channel_id: int) -> asyncio.Lock:
+        lock = cls._locks.get(channel_id)
+        if lock is None:
+            lock = cls._locks[channel_id] = asyncio.Lock()
+        return lock
+
+    @classmethod
+    async def get(cls, channel: discord.TextChannel) -> discord.Webhook:
+        webhook = cls.webhooks.get(channel.id)
+        if webhook:
+            return webhook
+
+        # два быстрых клика не должны создать два вебхука (лимит — 15 на канал)
+        async with cls._lock(channel.id):
+            webhook = cls.webhooks.get(channel.id)
+            if webhook:
+                return webhook
+
+            # после рестарта вебхук в канале уже может быть — ищем его один раз
+            webhooks = await channel.webhooks()
+            webhook = discord.utils.get(webhooks, name=WEBHOOK_NAME)
+
+            if not webhook:
+                webhook = await channel.create_webhook(name=WEBHOOK_NAME)
+
+            cls.webhooks[channel.id] = webhook
+            return webhook
+
+    @classmethod
+    def invalidate(cls, channel_id: int):
+        cls.webhooks.pop(channel_id, None)
+        cls._locks.pop(channel_id, None)
+
+    @classmethod
+    async def send(cls, channel: discord.TextChannel, **kwargs):
+        webhook = await cls.get(channel)
+
+        try:
+            return await webhook.send(**kwargs)
+        except discord.NotFound:
+            # вебхук удалили вручную — забываем и пересоздаём один раз
+            cls.invalidate(channel.id)
+            webhook = await cls.get(channel)
+            return await webhook.send(**kwargs)
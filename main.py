@@ -3,8 +3,13 @@ import discord
 from discord.ext import commands
 
 from config import DISCORD_TOKEN
+from core.attachment_mirror import AttachmentMirror
 from core.database import Database
+from core.instrumentation import InteractionMetrics
+from core.ticket_events import TicketEvents
+from core.ticket_cache import TicketCache
 from core.transcript_server import start_transcript_server
+from core.transcript_writer import shutdown_render_executor
 from config import TRANSCRIPT_HOST, TRANSCRIPT_PORT
 
 
@@ -32,12 +37,14 @@ async def main():
         await Database.connect()
         print("✅ MySQL connected")
 
+        await TicketCache.warm()
 
-        await bot.load_extension("cogs.tickets")
+        InteractionMetrics.install(bot)
+        InteractionMetrics.register("db", Database.stats)
+        InteractionMetrics.register("ticket_events", TicketEvents.stats)
 
-        from cogs.tickets import TicketCreateView, PersistentTicketView
-        bot.add_view(TicketCreateView())
-        bot.add_view(PersistentTicketView())
+        await bot.load_extension("cogs.logs")
+        await bot.load_extension("cogs.tickets")
 
         await bot.tree.sync()
         print("✅ Slash-команды синхронизированы")
@@ -48,6 +55,9 @@ async def main():
     try:
         await bot.start(DISCORD_TOKEN)
     finally:
+        shutdown_render_executor()
+        await AttachmentMirror.close()
+        await TicketEvents.close()
         await Database.close()
 
 
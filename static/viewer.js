@@ -0,0 +1,197 @@
+// Постраничный просмотр транскрипта: сообщения подгружаются по мере прокрутки.
+(function () {
+    "use strict";
+
+    var PAGE_SIZE = 100;
+
+    var root = document.getElementById("viewer");
+    var digest = root.dataset.digest;
+    var api = "/api/transcripts/" + digest;
+
+    var list = root.querySelector(".messages");
+    var loader = root.querySelector(".loader");
+    var people = root.querySelector(".participants");
+
+    var participants = {};
+    var state = { offset: 0, author: null, loading: false, done: false, generation: 0 };
+
+    function el(tag, className, text) {
+        var node = document.createElement(tag);
+        if (className) node.className = className;
+        if (text !== undefined && text !== null) node.textContent = text;
+        return node;
+    }
+
+    function avatar(participant) {
+        var node = el("div", "avatar");
+        if (participant && participant.avatar_url) {
+            node.style.backgroundImage = "url(\"" + encodeURI(participant.avatar_url) + "\")";
+        }
+        return node;
+    }
+
+    function formatTime(iso) {
+        return new Date(iso).toISOString().replace("T", " ").slice(0, 19) + " UTC";
+    }
+
+    function renderAttachment(attachment) {
+        var wrap = el("div", "attachment");
+        var type = attachment.content_type || "";
+
+        if (type.indexOf("image") === 0) {
+            var img = el("img");
+            img.src = attachment.url;
+            img.loading = "lazy";
+            wrap.appendChild(img);
+        } else if (type.indexOf("video") === 0) {
+            var video = el("video");
+            video.src = attachment.url;
+            video.controls = true;
+            video.preload = "none";
+            wrap.appendChild(video);
+        } else {
+            var link = el("a", null, "📎 " + attachment.filename);
+            link.href = attachment.url;
+            link.target = "_blank";
+            wrap.appendChild(link);
+        }
+
+        return wrap;
+    }
+
+    function renderEmbed(embed) {
+        var wrap = el("div", "embed");
+
+        if (embed.title) wrap.appendChild(el("div", "embed-title", embed.title));
+        if (embed.description) wrap.appendChild(el("div", "embed-desc", embed.description));
+
+        embed.fields.forEach(function (field) {
+            var node = el("div", "embed-field");
+            node.appendChild(el("b", null, field.name));
+            node.appendChild(el("br"));
+            node.appendChild(document.createTextNode(field.value));
+            wrap.appendChild(node);
+        });
+
+        return wrap.childNodes.length ? wrap : null;
+    }
+
+    function renderMessage(record) {
+        // при фильтре по автору соседние сообщения не подряд — группы не склеиваем
+        var continued = record.continued && !state.author;
+        var node = el("div", continued ? "message continued" : "message");
+        var body = el("div", "body");
+        var meta = el("div", "meta");
+
+        if (!continued) {
+            node.appendChild(avatar(participants[record.author_ref]));
+            meta.appendChild(el("span", "author", record.author_name));
+        }
+
+        meta.appendChild(el("span", "time", formatTime(record.created_at)));
+        if (record.edited) meta.appendChild(el("span", "flag", "(edited)"));
+        if (record.deleted) meta.appendChild(el("span", "flag deleted", "(deleted)"));
+
+        var content = el("div", "content");
+        if (record.content) content.appendChild(el("div", null, record.content));
+        record.attachments.forEach(function (attachment) {
+            content.appendChild(renderAttachment(attachment));
+        });
+        record.embeds.forEach(function (embed) {
+            var node = renderEmbed(embed);
+            if (node) content.appendChild(node);
+        });
+        if (!content.childNodes.length) content.appendChild(el("i", null, "(empty message)"));
+
+        body.appendChild(meta);
+        body.appendChild(content);
+        node.appendChild(body);
+        return node;
+    }
+
+    function loadPage() {
+        if (state.loading || state.done) return;
+        state.loading = true;
+
+        var generation = state.generation;
+        var url = api + "/messages?offset=" + state.offset + "&limit=" + PAGE_SIZE;
+        if (state.author) url += "&author=" + state.author;
+
+        fetch(url)
+            .then(function (response) {
+                if (!response.ok) throw new Error(response.status);
+                return response.json();
+            })
+            .then(function (page) {
+                // фильтр сменился, пока шёл запрос
+                if (generation !== state.generation) return;
+
+                var fragment = document.createDocumentFragment();
+                page.messages.forEach(function (record) {
+                    fragment.appendChild(renderMessage(record));
+                });
+                list.appendChild(fragment);
+
+                state.offset = page.next === null ? state.offset : page.next;
+                state.done = page.next === null;
+                loader.textContent = state.done ? page.total + " messages" : "Loading…";
+            })
+            .catch(function (error) {
+                loader.textContent = "Failed to load: " + error.message;
+            })
+            .then(function () {
+                if (generation !== state.generation) return;
+                state.loading = false;
+                // страница могла не заполнить экран — грузим следующую
+                if (!state.done && loader.getBoundingClientRect().top < window.innerHeight) loadPage();
+            });
+    }
+
+    function setAuthor(authorId) {
+        state.author = state.author === authorId ? null : authorId;
+        state.offset = 0;
+        state.done = false;
+        state.loading = false;
+        state.generation += 1;
+
+        people.querySelectorAll(".participant").forEach(function (node) {
+            node.classList.toggle("active", node.dataset.author === state.author);
+        });
+
+        list.textContent = "";
+        loadPage();
+    }
+
+    function renderParticipants(meta) {
+        meta.participants.forEach(function (participant) {
+            participants[participant.ref] = participant;
+
+            var node = el("div", "participant");
+            node.dataset.author = String(participant.id);
+            node.appendChild(avatar(participant));
+            node.appendChild(el("span", "author", participant.name));
+            node.appendChild(el("span", "userid", "(" + participant.id + ")"));
+            node.appendChild(el("span", "count", participant.messages));
+            node.addEventListener("click", function () {
+                setAuthor(node.dataset.author);
+            });
+            people.appendChild(node);
+        });
+    }
+
+    fetch(api + "/meta")
+        .then(function (response) {
+            if (!response.ok) throw new Error(response.status);
+            return response.json();
+        })
+        .then(function (meta) {
+            renderParticipants(meta);
+
+            new IntersectionObserver(function (entries) {
+                if (entries[0].isIntersecting) loadPage();
+            }, { rootMargin: "800px" }).observe(loader);
+        })
+        .catch(function (error) {
+            loader.textContent = "Failed to load: " + error.message;
+        });
+})();
@@ -0,0 +1,64 @@
+import asyncio
+import os
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip("discord")
+
+# config требует эти переменные при импорте
+os.environ.setdefault("DISCORD_TOKEN", "test")
+os.environ.setdefault("TICKET_CATEGORY_ID", "1")
+os.environ.setdefault("TICKET_ADMIN_ROLE_ID", "1")
+
+import discord
+
+from core import checks
+from core.instrumentation import InteractionMetrics
+from core.tracing import ACK, current_trace, stage
+
+
+class AdminView(checks.TicketView):
+    admin_only = True
+
+
+class Response:
+    def __init__(self):
+        self.done = False
+
+    def is_done(self):
+        return self.done
+
+    async def send_message(self, content, **kwargs):
+        with stage(ACK):
+            self.done = True
+
+    async def defer(self, **kwargs):
+        with stage(ACK):
+            self.done = True
+
+
+def test_rejected_interaction_finishes_trace(monkeypatch):
+    monkeypatch.setattr(InteractionMetrics, "histograms", {})
+    monkeypatch.setattr(InteractionMetrics, "counters", {})
+    monkeypatch.setattr(checks, "arm", lambda interaction: None)
+
+    interaction = SimpleNamespace(
+        id=1,
+        user=SimpleNamespace(),
+        data={"custom_id": "delete"},
+        created_at=discord.utils.utcnow(),
+        response=Response(),
+    )
+
+    async def run():
+        allowed = await AdminView().interaction_check(interaction)
+        return allowed, current_trace.get()
+
+    allowed, trace = asyncio.run(run())
+
+    handler = (("handler", "AdminView.interaction_check"),)
+    assert allowed is False
+    assert trace is None
+    assert InteractionMetrics.counters[("interaction_rejected_total", handler)] == 1
+    assert ("interaction_ack_seconds", handler) in InteractionMetrics.histograms
@@ -0,0 +1,17 @@
+from decimal import Decimal
+
+from utils.formatting import format_average
+
+
+def test_format_average_empty():
+    assert format_average(None, 0) == "—"
+
+
+def test_format_average_minutes():
+    assert format_average(Decimal(1500), 1) == "25м"
+
+
+def test_format_average_hours_from_decimal_sum():
+    # SUM() из aiomysql приходит Decimal — и сумма, и количество
+    assert format_average(Decimal(3 * 3600 + 5 * 60), Decimal(1)) == "3ч 05м"
+    assert format_average(Decimal(7 * 3600), Decimal(2)) == "3ч 30м"
@@ -0,0 +1,25 @@
+import pytest
+
+from utils.steam import parse_steamid, parse_steamids, to_steamid64
+
+STEAM_ID64 = 76561197960265975
+
+
+@pytest.mark.parametrize("value", [
+    "STEAM_0:1:123",
+    "[U:1:247]",
+    "U:1:247",
+    "76561197960265975",
+    "https://steamcommunity.com/profiles/76561197960265975/",
+])
+def test_to_steamid64(value):
+    assert to_steamid64(value) == STEAM_ID64
+
+
+@pytest.mark.parametrize("value", ["[U:1:247", "U:1:247]", "STEAM_0:2:1", "nickname"])
+def test_parse_steamid_rejects(value):
+    assert parse_steamid(value) is None
+
+
+def test_parse_steamids_keeps_order():
+    assert parse_steamids(["[U:1:247]", "nick", "U:1:247"]) == [STEAM_ID64, None, STEAM_ID64]
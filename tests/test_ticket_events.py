@@ -0,0 +1,66 @@
+import asyncio
+import os
+
+import pytest
+
+pytest.importorskip("aiomysql")
+
+# config требует эти переменные при импорте
+os.environ.setdefault("DISCORD_TOKEN", "test")
+os.environ.setdefault("TICKET_CATEGORY_ID", "1")
+os.environ.setdefault("TICKET_ADMIN_ROLE_ID", "1")
+
+import aiomysql
+
+from core import ticket_events
+from core.ticket_events import FLUSH_ATTEMPTS, TicketEvents
+
+
+class FlakyDatabase:
+    def __init__(self):
+        self.down = True
+        self.batch_errors = 0
+        self.row_inserts = 0
+
+    async def executemany(self, query, rows):
+        if self.down or self.batch_errors:
+            self.batch_errors = max(self.batch_errors - 1, 0)
+            raise aiomysql.OperationalError(2013, "Lost connection")
+
+    async def execute(self, query, row):
+        self.row_inserts += 1
+        if self.down:
+            raise aiomysql.OperationalError(2013, "Lost connection")
+
+
+@pytest.fixture
+def database(monkeypatch):
+    database = FlakyDatabase()
+    monkeypatch.setattr(ticket_events, "Database", database)
+    monkeypatch.setattr(TicketEvents, "_buffer", [(1, "created", 2, None, None)])
+    monkeypatch.setattr(TicketEvents, "_failures", 0)
+    monkeypatch.setattr(TicketEvents, "_lock", asyncio.Lock())
+    return database
+
+
+def test_failed_row_fallback_resets_batch_retries(database):
+    async def run():
+        # пачка не прошла FLUSH_ATTEMPTS раз, построчный проход оборвался
+        for _ in range(FLUSH_ATTEMPTS):
+            with pytest.raises(aiomysql.OperationalError):
+                await TicketEvents.flush()
+
+        # MySQL вернулся; разовый сбой пачки снова повторяется целиком
+        database.down = False
+        database.batch_errors = 1
+        row_inserts = database.row_inserts
+
+        with pytest.raises(aiomysql.OperationalError):
+            await TicketEvents.flush()
+
+        return row_inserts
+
+    row_inserts = asyncio.run(run())
+
+    assert database.row_inserts == row_inserts
+    assert len(TicketEvents._buffer) == 1
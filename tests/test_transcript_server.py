@@ -0,0 +1,66 @@
+import asyncio
+import os
+
+import pytest
+
+pytest.importorskip("aiohttp")
+pytest.importorskip("discord")
+
+# config требует эти переменные при импорте
+os.environ.setdefault("DISCORD_TOKEN", "test")
+os.environ.setdefault("TICKET_CATEGORY_ID", "1")
+os.environ.setdefault("TICKET_ADMIN_ROLE_ID", "1")
+
+from aiohttp import web
+from aiohttp.test_utils import TestClient, TestServer
+
+from core import transcript_server
+
+BODY = b"<html>legacy transcript</html>"
+
+
+async def fetch(path: str, headers: dict = None):
+    app = web.Application()
+    app.router.add_get("/transcripts/{filename}", transcript_server.handle_transcripts)
+
+    async with TestClient(TestServer(app)) as client:
+        response = await client.get(path, headers=headers or {})
+        return response.status, response.headers.copy(), await response.read()
+
+
+@pytest.fixture
+def legacy_dir(tmp_path, monkeypatch):
+    (tmp_path / "ticket-0001u.html").write_bytes(BODY)
+    (tmp_path / "manifest.jsonl").write_text("{}\n")
+    monkeypatch.setattr(transcript_server, "TRANSCRIPTS_DIR", str(tmp_path))
+    return tmp_path
+
+
+def test_legacy_transcript_sends_content_hash_etag(legacy_dir):
+    path = str(legacy_dir / "ticket-0001u.html")
+    stat = os.stat(path)
+    expected = asyncio.run(transcript_server.get_etag(path, stat))
+
+    status, headers, body = asyncio.run(fetch("/transcripts/ticket-0001u.html"))
+
+    assert status == 200
+    assert body == BODY
+    assert headers["ETag"] == expected
+    assert headers["ETag"] != f'"{stat.st_mtime_ns:x}-{stat.st_size:x}"'
+
+
+def test_legacy_transcript_not_modified_by_content_etag(legacy_dir):
+    path = str(legacy_dir / "ticket-0001u.html")
+    etag = asyncio.run(transcript_server.get_etag(path, os.stat(path)))
+
+    status, headers, _ = asyncio.run(
+        fetch("/transcripts/ticket-0001u.html", {"If-None-Match": etag})
+    )
+
+    assert status == 304
+    assert headers["ETag"] == etag
+
+
+def test_legacy_route_does_not_serve_manifest(legacy_dir):
+    status, _, _ = asyncio.run(fetch("/transcripts/manifest.jsonl"))
+    assert status == 404
@@ -0,0 +1,342 @@
+import hashlib
+import os
+from datetime import datetime, timezone
+from string import Formatter
+
+STATIC_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "static")
+
+
+def load_static(name: str):
+    # файл читается один раз; версия = хэш содержимого,
+    # чтобы сервер мог отдавать его как immutable
+    with open(os.path.join(STATIC_DIR, name), "rb") as f:
+        body = f.read()
+
+    return body, hashlib.sha256(body).hexdigest()[:12]
+
+
+def static_url(name: str, version: str) -> str:
+    stem, extension = os.path.splitext(name)
+    return f"/static/{stem}.{version}{extension}"
+
+
+# стили общие для всех транскриптов
+TRANSCRIPT_CSS, TRANSCRIPT_CSS_VERSION = load_static("transcript.css")
+TRANSCRIPT_CSS_URL = static_url("transcript.css", TRANSCRIPT_CSS_VERSION)
+
+# постраничный просмотрщик больших транскриптов
+VIEWER_JS, VIEWER_JS_VERSION = load_static("viewer.js")
+VIEWER_JS_URL = static_url("viewer.js", VIEWER_JS_VERSION)
+
+
+# ================== ESCAPING ==================
+
+_ESCAPE_TABLE = str.maketrans({
+    "&": "&amp;",
+    "<": "&lt;",
+    ">": "&gt;",
+    '"': "&quot;",
+    "'": "&#x27;",
+})
+
+
+def escape(value) -> str:
+    # один проход translate вместо цепочки replace; годится и для атрибутов
+    if value is None:
+        return ""
+    return str(value).translate(_ESCAPE_TABLE)
+
+
+# внутри <style> сущности HTML не раскрываются — url экранируем процентами
+_CSS_URL_TABLE = str.maketrans({
+    '"': "%22",
+    "\\": "%5C",
+    "<": "%3C",
+    ">": "%3E",
+    "\n": "%0A",
+    "\r": "%0D",
+})
+
+
+def css_url(value: str) -> str:
+    return value.translate(_CSS_URL_TABLE)
+
+
+# ================== TEMPLATES ==================
+
+def compile_template(template: str):
+    # разбираем шаблон один раз: дальше рендер — это только join готовых кусков
+    parts = []
+
+    for literal, field, _, _ in Formatter().parse(template):
+        if literal:
+            parts.append((literal, None))
+        if field is not None:
+            parts.append((None, field))
+
+    def render(**values) -> str:
+        return "".join(
+            literal if field is None else values[field]
+            for literal, field in parts
+        )
+
+    return render
+
+
+_header = compile_template("""<!DOCTYPE html>
+<html>
+<head>
+<meta charset="utf-8">
+<title>Transcript {channel}</title>
+<link rel="stylesheet" href="{css_url}">
+</head>
+<body>
+<div class="container">
+<div class="header"><h1>📄 Transcript — #{channel}</h1></div>
+<div class="info"><div><div class="label">Channel</div><div>#{channel}</div></div></div>
+<div class="messages">
+""")
+
+_footer = compile_template("""</div>
+<div class="info footer"><div><div class="label">Total messages</div><div>{total}</div></div></div>
+<div class="participants">
+<div class="label">Participants</div>
+{participants}</div>
+<style>
+{avatars}</style>
+</div>
+</body>
+</html>
+""")
+
+_message = compile_template(
+    '<div class="message">'
+    '<div class="avatar {ref}"></div>'
+    '<div class="body">'
+    '<div class="meta">'
+    '<span class="author">{author}</span>'
+    '<span class="time">{time}</span>'
+    '{flags}'
+    '</div>'
+    '<div class="content">{content}</div>'
+    '</div>'
+    '</div>\n'
+)
+
+# продолжение группы: без аватара и имени, как в Discord
+_message_continued = compile_template(
+    '<div class="message continued">'
+    '<div class="body">'
+    '<div class="meta"><span class="time">{time}</span>{flags}</div>'
+    '<div class="content">{content}</div>'
+    '</div>'
+    '</div>\n'
+)
+
+_participant = compile_template(
+    '<div class="participant">'
+    '<div class="avatar {ref}"></div>'
+    '<span class="author">{author}</span>'
+    '<span class="userid">({author_id})</span>'
+    '<span class="count">{messages}</span>'
+    '</div>\n'
+)
+_avatar_rule = compile_template('.{ref}{{background-image:url("{url}")}}\n')
+
+_image = compile_template('<div class="attachment"><img src="{url}"></div>')
+_video = compile_template('<div class="attachment"><video src="{url}" controls></video></div>')
+_file = compile_template('<div class="attachment"><a href="{url}" target="_blank">📎 {name}</a></div>')
+
+_embed_title = compile_template('<div class="embed-title">{text}</div>')
+_embed_desc = compile_template('<div class="embed-desc">{text}</div>')
+_embed_field = compile_template('<div class="embed-field"><b>{name}</b><br>{value}</div>')
+
+_viewer = compile_template("""<!DOCTYPE html>
+<html>
+<head>
+<meta charset="utf-8">
+<title>Transcript {channel}</title>
+<link rel="stylesheet" href="{css_url}">
+</head>
+<body>
+<div class="container" id="viewer" data-digest="{digest}">
+<div class="header"><h1>📄 Transcript — #{channel}</h1><a class="export" href="/transcripts/{digest}.html">HTML</a></div>
+<div class="participants"><div class="label">Participants</div></div>
+<div class="messages"></div>
+<div class="loader">Loading…</div>
+</div>
+<script src="{js_url}"></script>
+</body>
+</html>
+""")
+
+FLAG_EDITED = '<span class="flag">(edited)</span>'
+FLAG_DELETED = '<span class="flag deleted">(deleted)</span>'
+EMPTY_MESSAGE = "<i>(empty message)</i>"
+
+
+# ================== RENDER ==================
+
+def render_transcript_header(channel_name: str) -> str:
+    return _header(channel=escape(channel_name), css_url=TRANSCRIPT_CSS_URL)
+
+
+def render_transcript_footer(total_messages: int, participants: list) -> str:
+    # количество сообщений и участники известны только в конце потока;
+    # аватар каждого участника упоминается в файле ровно один раз
+    return _footer(
+        total=str(total_messages),
+        participants="".join(
+            _participant(
+                ref=participant["ref"],
+                author=escape(participant["name"]),
+                author_id=str(participant["id"]),
+                messages=str(participant["messages"])
+            )
+            for participant in participants
+        ),
+        avatars="".join(
+            _avatar_rule(ref=participant["ref"], url=css_url(participant["avatar_url"]))
+            for participant in participants
+            if participant["avatar_url"]
+        )
+    )
+
+
+def render_viewer_page(digest: str, channel_name: str) -> str:
+    return _viewer(
+        digest=digest,
+        channel=escape(channel_name),
+        css_url=TRANSCRIPT_CSS_URL,
+        js_url=VIEWER_JS_URL
+    )
+
+
+def render_attachment(attachment: dict) -> str:
+    url = escape(attachment["url"])
+    content_type = attachment["content_type"] or ""
+
+    if content_type.startswith("image"):
+        return _image(url=url)
+    if content_type.startswith("video"):
+        return _video(url=url)
+    return _file(url=url, name=escape(attachment["filename"]))
+
+
+def render_embed(embed: dict) -> str:
+    parts = []
+
+    if embed["title"]:
+        parts.append(_embed_title(text=escape(embed["title"])))
+
+    if embed["description"]:
+        parts.append(_embed_desc(text=escape(embed["description"])))
+
+    for field in embed["fields"]:
+        parts.append(_embed_field(name=escape(field["name"]), value=escape(field["value"])))
+
+    if not parts:
+        return ""
+    return '<div class="embed">' + "".join(parts) + "</div>"
+
+
+def render_message_html(record: dict) -> str:
+    created_at = datetime.fromisoformat(record["created_at"])
+    timestamp = created_at.astimezone(timezone.utc).strftime("%Y-%m-%d %H:%M:%S UTC")
+
+    content_parts = []
+
+    if record["content"]:
+        content_parts.append(f"<div>{escape(record['content'])}</div>")
+
+    content_parts.extend(render_attachment(attachment) for attachment in record["attachments"])
+    content_parts.extend(render_embed(embed) for embed in record["embeds"])
+
+    content = "".join(content_parts) or EMPTY_MESSAGE
+
+    flags = ""
+    if record.get("edited"):
+        flags += FLAG_EDITED
+    if record.get("deleted"):
+        flags += FLAG_DELETED
+
+    if record.get("continued"):
+        return _message_continued(time=timestamp, flags=flags, content=content)
+
+    return _message(
+        ref=record["author_ref"],
+        author=escape(record["author_name"]),
+        time=timestamp,
+        flags=flags,
+        content=content
+    )
+
+
+# ================== PARTICIPANTS ==================
+
+# сообщения одного автора подряд в пределах 7 минут склеиваются в группу
+GROUP_WINDOW_SECONDS = 7 * 60
+
+
+class TranscriptParticipants:
+    def __init__(self):
+        # author_id -> {"ref", "id", "name", "avatar_url", "messages"}
+        self.by_author = {}
+
+        self._last_author = None
+        self._last_time = None
+
+    def annotate(self, records: list):
+        # выполняется в лупе до отправки пачки в пул: группировка
+        # должна видеть границы пачек, а рендер — нет
+        for record in records:
+            author_id = record["author_id"]
+            created_at = datetime.fromisoformat(record["created_at"])
+
+            participant = self.by_author.get(author_id)
+            if participant is None:
+                participant = self.by_author[author_id] = {
+                    "ref": f"u{len(self.by_author):x}",
+                    "id": author_id,
+                    "messages": 0,
+                }
+
+            # имя и аватар — по последнему сообщению участника
+            participant["name"] = record["author_name"]
+            participant["avatar_url"] = record["avatar_url"]
+            participant["messages"] += 1
+
+            record["author_ref"] = participant["ref"]
+            record["continued"] = (
+                author_id == self._last_author
+                and (created_at - self._last_time).total_seconds() <= GROUP_WINDOW_SECONDS
+            )
+
+            self._last_author = author_id
+            self._last_time = created_at
+
+    def __iter__(self):
+        return iter(self.by_author.values())
+
+    def __len__(self):
+        return len(self.by_author)
+
+
+def render_batch(records: list) -> str:
+    # выполняется в воркере пула: только чистые данные на входе и строка на выходе
+    return "".join(render_message_html(record) for record in records)
+
+
+# ================== STATS ==================
+
+def format_average(total_seconds: int, count: int) -> str:
+    if not count:
+        return "—"
+
+    # суммы из БД могут прийти Decimal — форматируем только целые
+    seconds = int(total_seconds) // int(count)
+    if seconds < 60:
+        return f"{seconds}с"
+    if seconds < 3600:
+        return f"{seconds // 60}м"
+    return f"{seconds // 3600}ч {seconds % 3600 // 60:02d}м"
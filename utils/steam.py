@@ -0,0 +1,61 @@
+import re
+from functools import lru_cache
+
+# SteamID64 индивидуального аккаунта = база + account id
+STEAMID64_BASE = 76561197960265728
+ACCOUNT_ID_MAX = (1 << 32) - 1
+
+STEAM_CACHE_SIZE = 4096
+
+# STEAM_X:Y:Z — Y младший бит account id, Z — остальные биты
+STEAM2_RE = re.compile(r"STEAM_[0-5]:([01]):(\d{1,10})", re.IGNORECASE)
+# [U:1:N] и U:1:N — N сам account id; скобки либо обе, либо ни одной
+STEAM3_RE = re.compile(r"\[U:1:(\d{1,10})\]|U:1:(\d{1,10})", re.IGNORECASE)
+STEAM64_RE = re.compile(r"\d{17}")
+PROFILE_URL_RE = re.compile(
+    r"(?:https?://)?(?:www\.)?steamcommunity\.com/profiles/(\d{17})/?",
+    re.IGNORECASE
+)
+
+
+def _from_account_id(account_id: int) -> int:
+    if account_id > ACCOUNT_ID_MAX:
+        raise ValueError("Неверный формат SteamID")
+    return STEAMID64_BASE + account_id
+
+
+@lru_cache(maxsize=STEAM_CACHE_SIZE)
+def to_steamid64(value: str) -> int:
+    value = value.strip()
+
+    match = STEAM2_RE.fullmatch(value)
+    if match:
+        return _from_account_id(int(match.group(2)) * 2 + int(match.group(1)))
+
+    match = STEAM3_RE.fullmatch(value)
+    if match:
+        return _from_account_id(int(match.group(1) or match.group(2)))
+
+    match = PROFILE_URL_RE.fullmatch(value)
+    if match:
+        value = match.group(1)
+
+    if STEAM64_RE.fullmatch(value):
+        steam_id64 = int(value)
+        if STEAMID64_BASE <= steam_id64 <= STEAMID64_BASE + ACCOUNT_ID_MAX:
+            return steam_id64
+
+    raise ValueError("Неверный формат SteamID")
+
+
+def parse_steamid(value: str):
+    # то же, что to_steamid64, но для произвольного текста (ник или SteamID)
+    try:
+        return to_steamid64(value)
+    except ValueError:
+        return None
+
+
+def parse_steamids(values) -> list:
+    # пачкой: повторы внутри пачки и между вызовами отдаёт кэш
+    return [parse_steamid(value) for value in values]
@@ -1,15 +1,9 @@
-import re
+from utils.steam import to_steamid64
 
-def validate_steamid(value: str) -> str:
-    value = value.strip()
-
-    if re.fullmatch(r"STEAM_[0-5]:[01]:\d+", value):
-        return value
 
-    if re.fullmatch(r"\d{17}", value):
-        return value
-
-    raise ValueError("Неверный формат SteamID")
+def validate_steamid(value: str) -> str:
+    # STEAM_X:Y:Z, [U:1:N], SteamID64 и ссылка на профиль -> SteamID64
+    return str(to_steamid64(value))
 
 
 def clean_text(value: str, max_length: int) -> str: